@@ -1,8 +1,11 @@
 # connectors/air_aerodatabox.py
 import os
 import requests
+import numpy as np
 import pandas as pd
 import time
+from connectors import deadline
+from datetime import datetime, timezone, timedelta
 
 API_KEY = os.getenv("AERODATABOX_API_KEY", "YOUR_API_KEY_HERE")
 API_HOST = os.getenv("AERODATABOX_API_HOST", "aerodatabox.p.rapidapi.com")
@@ -13,63 +16,184 @@ HEADERS = {
     "x-rapidapi-host": API_HOST
 }
 
+# Bundled airport list (regenerate with scripts/build_airport_catalog.py); lower tier = crawled first
+CATALOG_PATH = os.path.join("data", "reference", "airports.csv")
+MAX_TIER = int(os.getenv("AERODATABOX_MAX_TIER", "3"))
+# API calls per run; the rest of the catalog is picked up by the next runs
+MAX_AIRPORTS_PER_RUN = int(os.getenv("AERODATABOX_MAX_AIRPORTS", "300"))
+# a checkpoint younger than this is reused instead of re-fetched
+REFRESH_DAYS = int(os.getenv("AERODATABOX_REFRESH_DAYS", "90"))
+# a failed airport is skipped for this long, doubling per consecutive failure up to the cap
+FAIL_BACKOFF_DAYS = int(os.getenv("AERODATABOX_FAIL_BACKOFF_DAYS", "30"))
+FAIL_BACKOFF_CAP_DAYS = 365
+# share of each run's calls kept for never-fetched airports, so coverage keeps growing even
+# when refreshing the higher tiers alone would use the whole MAX_AIRPORTS_PER_RUN
+NEW_SHARE = float(os.getenv("AERODATABOX_NEW_SHARE", "0.33"))
+
+# One CSV per origin airport + an index of when each was fetched (committed by the workflow,
+# so coverage accumulates across monthly runs)
+CHECKPOINT_DIR = os.path.join("data", "checkpoints", "aerodatabox")
+INDEX_FILE = "_index.csv"
+
+COLUMNS = [
+    "transport_type", "operator_name",
+    "origin_city", "origin_country", "origin_station",
+    "destination_city", "destination_country", "destination_station",
+    "duration", "frequency_daily", "frequency_label",
+    "origin_lat", "origin_lon", "dest_lat", "dest_lon",
+]
+
+def load_catalog(path=CATALOG_PATH, max_tier=MAX_TIER):
+    # keep_default_na: "NA" is Namibia, not missing
+    cat = pd.read_csv(path, keep_default_na=False, dtype={"iata": str})
+    return cat[cat["tier"] <= max_tier].sort_values(["tier", "iata"]).reset_index(drop=True)
+
+# fetched_at/routes describe the last good checkpoint; status/failures/retry_after the last attempt
+INDEX_COLUMNS = ["iata", "fetched_at", "routes", "status", "failures", "retry_after"]
+
+def _load_index():
+    path = os.path.join(CHECKPOINT_DIR, INDEX_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    index = pd.read_csv(path, keep_default_na=False, dtype={"iata": str})
+    index = index.reindex(columns=INDEX_COLUMNS, fill_value="")   # older index files: no failure columns
+    index["failures"] = pd.to_numeric(index["failures"], errors="coerce").fillna(0).astype(int)
+    return index
+
+def _save_index(index):
+    path = os.path.join(CHECKPOINT_DIR, INDEX_FILE)
+    tmp = path + ".tmp"
+    index.sort_values("iata").to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def _routes_frame(data):
+    """Columnar rows for one airport response: origin fields once, destination fields as lists."""
+    airport = data.get("airport", {}) or {}
+    o_loc = airport.get("location", {}) or {}
+    arrivals = [d.get("arrival", {}) or {} for d in data.get("routes", [])]
+    arrivals = [a for a in arrivals if a.get("iata")]
+    n = len(arrivals)
+    return pd.DataFrame({
+        "transport_type": ["air"] * n,
+        "operator_name": [None] * n,
+        "origin_city": [airport.get("municipalityName", "")] * n,
+        "origin_country": [airport.get("countryName", "")] * n,
+        "origin_station": [airport.get("name", "")] * n,
+        "destination_city": [a.get("municipalityName", "") for a in arrivals],
+        "destination_country": [a.get("countryName", "") for a in arrivals],
+        "destination_station": [a.get("name", "") for a in arrivals],
+        "duration": [None] * n,
+        "frequency_daily": [None] * n,
+        "frequency_label": [None] * n,
+        "origin_lat": [o_loc.get("lat")] * n,
+        "origin_lon": [o_loc.get("lon")] * n,
+        "dest_lat": [(a.get("location", {}) or {}).get("lat") for a in arrivals],
+        "dest_lon": [(a.get("location", {}) or {}).get("lon") for a in arrivals],
+    }, columns=COLUMNS)
+
+def _record(index, origin, **fields):
+    """Upsert one airport's index row (fields not given keep their previous value)."""
+    prev = index[index["iata"] == origin]
+    row = prev.iloc[0].to_dict() if len(prev) else {c: "" for c in INDEX_COLUMNS} | {"iata": origin, "failures": 0}
+    row.update(fields)
+    return pd.concat([index[index["iata"] != origin], pd.DataFrame([row], columns=INDEX_COLUMNS)],
+                     ignore_index=True)
+
+def _record_failure(index, origin, status, now):
+    prev = index.loc[index["iata"] == origin, "failures"]
+    failures = int(prev.iloc[0]) + 1 if len(prev) else 1
+    days = min(FAIL_BACKOFF_CAP_DAYS, FAIL_BACKOFF_DAYS * 2 ** (failures - 1))
+    return _record(index, origin, status=status, failures=failures,
+                   retry_after=(now + timedelta(days=days)).isoformat())
+
+def _due_airports(catalog, index, now, limit=None):
+    """
+    Catalog airports without a fresh checkpoint and not backing off after a failure,
+    by tier: never-attempted first, then previously failing ones, then the oldest.
+    With a limit, the first `limit` entries keep NEW_SHARE of the slots for never-attempted
+    airports of any tier (the rest of the list follows in the same order).
+    """
+    by_iata = index.set_index("iata") if len(index) else pd.DataFrame(columns=INDEX_COLUMNS[1:])
+    last = pd.to_datetime(catalog["iata"].map(by_iata["fetched_at"]), utc=True, errors="coerce")
+    retry = pd.to_datetime(catalog["iata"].map(by_iata["retry_after"]), utc=True, errors="coerce")
+    failures = catalog["iata"].map(by_iata["failures"]).fillna(0).astype(int)
+    stale = last.isna() | (last < now - timedelta(days=REFRESH_DAYS))
+    due = catalog.assign(_last=last, _failures=failures)[stale & ~(retry > now)]
+    due = due.sort_values(["tier", "_failures", "_last"], na_position="first")
+    if limit is None or len(due) <= limit:
+        return due["iata"].tolist()
+    never = due["_last"].isna() & (due["_failures"] == 0)
+    n_new = min(int(never.sum()), max(int(np.ceil(limit * NEW_SHARE)), limit - int((~never).sum())))
+    picked = due[never].index[:n_new].union(due[~never].index[:limit - n_new])
+    first = due.loc[due.index.isin(picked)]
+    return first["iata"].tolist() + due.loc[~due.index.isin(picked), "iata"].tolist()
+
+def _assemble(catalog):
+    frames = []
+    for iata in catalog["iata"]:
+        path = os.path.join(CHECKPOINT_DIR, f"{iata}.csv")
+        if os.path.exists(path):
+            frames.append(pd.read_csv(path, keep_default_na=False, na_values=[""]))
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
 def fetch_routes():
     """
     Pulls direct flight routes (origin–destination) from AeroDataBox airport endpoints.
+    Walks the airport catalog in tier order, at most MAX_AIRPORTS_PER_RUN calls per run,
+    checkpointing each airport; the result covers every airport fetched so far.
     """
     print("Connecting to AeroDataBox API...")
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    catalog = load_catalog()
+    index = _load_index()
+    now = datetime.now(timezone.utc)
+    due = _due_airports(catalog, index, now, MAX_AIRPORTS_PER_RUN)
+    print(f"   {len(catalog)} airports in catalog (tier ≤ {MAX_TIER}), {len(due)} due, "
+          f"fetching up to {MAX_AIRPORTS_PER_RUN} this run")
 
-    # A representative sample of key airports (expand later)
-    airports = [
-        "LHR", "LGW", "CDG", "ORY", "FRA", "MUC", "AMS", "MAD", "BCN",
-        "DUB", "MXP", "FCO", "ZRH", "VIE", "LIS", "IST", "ATH",
-        "JFK", "LAX", "ORD", "ATL", "DFW", "YYZ", "YUL", "YVR"
-    ]
-
-    all_routes = []
-
-    for origin in airports:
+    for origin in due[:MAX_AIRPORTS_PER_RUN]:
+        if deadline.expired():
+            # checkpoints make a partial crawl safe: stop here, the next run continues
+            print("⚠️  AeroDataBox time budget reached — resuming from here next run")
+            break
         try:
             print(f"✈ Fetching routes from {origin} ...")
             url = f"{BASE_URL}/airports/{origin}/routes"
-            r = requests.get(url, headers=HEADERS, timeout=60)
-            if r.status_code != 200:
+            r = requests.get(url, headers=HEADERS, timeout=deadline.timeout(60))
+            if r.status_code == 429:
+                print("⚠️  AeroDataBox quota reached — resuming from here next run")
+                break
+            if r.status_code in (401, 403):
+                # key/subscription problem, not this airport's: don't mark the catalog as failing
+                print(f"⚠️  AeroDataBox rejected the API key ({r.status_code}) — stopping")
+                break
+            if r.status_code == 204:
+                data = {}
+            elif r.status_code != 200:
                 print(f"⚠️  {origin}: {r.status_code} {r.text[:120]}")
+                index = _record_failure(index, origin, f"HTTP {r.status_code}", now)
+                _save_index(index)
                 continue
+            else:
+                data = r.json()
 
-            data = r.json()
-
-            destinations = data.get("routes", [])
-            for dest in destinations:
-                dest_code = dest.get("arrival", {}).get("iata", "")
-                dest_city = dest.get("arrival", {}).get("municipalityName", "")
-                dest_country = dest.get("arrival", {}).get("countryName", "")
-                dest_name = dest.get("arrival", {}).get("name", "")
-
-                origin_city = data.get("airport", {}).get("municipalityName", "")
-                origin_country = data.get("airport", {}).get("countryName", "")
-                origin_name = data.get("airport", {}).get("name", "")
-
-                if dest_code:
-                    all_routes.append({
-                        "transport_type": "air",
-                        "operator_name": None,
-                        "origin_city": origin_city,
-                        "origin_country": origin_country,
-                        "origin_station": origin_name,
-                        "destination_city": dest_city,
-                        "destination_country": dest_country,
-                        "destination_station": dest_name,
-                        "duration": None,
-                        "frequency_daily": None,
-                        "frequency_label": None
-                    })
+            df = _routes_frame(data)
+            df.to_csv(os.path.join(CHECKPOINT_DIR, f"{origin}.csv"), index=False)
+            index = _record(index, origin, fetched_at=now.isoformat(), routes=len(df),
+                            status="ok", failures=0, retry_after="")
+            _save_index(index)
 
             time.sleep(1)  # gentle delay for free-tier rate limits
 
         except Exception as e:
             print(f"❌ Error fetching {origin}: {e}")
+            index = _record_failure(index, origin, type(e).__name__, now)
+            _save_index(index)
 
-    df = pd.DataFrame(all_routes).drop_duplicates()
-    print(f"✅ Fetched {len(df)} unique routes from AeroDataBox.")
+    df = _assemble(catalog).drop_duplicates()
+    print(f"✅ Fetched {len(df)} unique routes from AeroDataBox "
+          f"({int((index['fetched_at'] != '').sum())} airports checkpointed, "
+          f"{int((index['failures'] > 0).sum())} backing off after failures).")
     return df
@@ -1,8 +1,9 @@
 # connectors/bus_alsa.py
-import io, os, zipfile, pandas as pd
+import io, os, zipfile, numpy as np, pandas as pd
 from connectors.bus_flixbus import (
-    _get_with_retries, _parse_time_to_sec, _sec_to_hhmm, _extract_city, _infer_country
+    _get_with_retries, _sec_to_hhmm, _extract_city, _infer_country
 )
+from connectors import gtfs_io, gtfs_pairs, gtfs_profiles
 
 # Spain NAP (MITMA) needs an ApiKey header.
 # Feed used here is ALSA Autobuses (NAP "Fichero" id 1133 per Transitland). You can override via env var.
@@ -12,65 +13,57 @@ ES_NAP_APIKEY = os.getenv("ES_NAP_APIKEY")  # <-- set this in GitHub Secrets
 OPERATOR_NAME = "ALSA"
 AGENCY_MATCH  = ["alsa"]
 
-def _read_csv(zf: zipfile.ZipFile, name: str) -> pd.DataFrame:
-    with zf.open(name) as f:
-        raw = f.read()
-    for enc in ("utf-8","utf-8-sig","latin-1"):
-        try:
-            return pd.read_csv(io.BytesIO(raw), encoding=enc)
-        except Exception:
-            continue
-    return pd.read_csv(io.BytesIO(raw), encoding="utf-8", errors="ignore")
-
 def fetch_routes() -> pd.DataFrame:
     if not ES_NAP_APIKEY:
         print("ALSA: ES_NAP_APIKEY not set — skipping ALSA for now.")
         return pd.DataFrame(columns=[
             "transport_type","operator_name","duration","frequency_daily","frequency_label",
             "origin_station","destination_station","origin_city","destination_city",
-            "origin_country","destination_country"
+            "origin_country","destination_country",
+            "origin_lat","origin_lon","dest_lat","dest_lon",
+            *gtfs_profiles.PROFILE_COLUMNS
         ])
     url = NAP_BASE + str(NAP_FILE_ID)
     print(f"Fetching ALSA from Spain NAP (file {NAP_FILE_ID})…")
     zbytes = _get_with_retries(url, headers={"ApiKey": ES_NAP_APIKEY})
     zf = zipfile.ZipFile(io.BytesIO(zbytes))
 
-    agencies = _read_csv(zf, "agency.txt")
-    routes   = _read_csv(zf, "routes.txt")
-    trips    = _read_csv(zf, "trips.txt")
-    st       = _read_csv(zf, "stop_times.txt")
-    stops    = _read_csv(zf, "stops.txt")
-    cal = _read_csv(zf, "calendar.txt") if "calendar.txt" in zf.namelist() else None
+    agencies = gtfs_io.read_table(zf, "agency.txt")
+    routes   = gtfs_io.read_table(zf, "routes.txt")
+    trips    = gtfs_io.read_table(zf, "trips.txt")
+    st       = gtfs_io.read_table(zf, "stop_times.txt")
+    stops    = gtfs_io.read_table(zf, "stops.txt")
+    cal = gtfs_io.read_table(zf, "calendar.txt") if "calendar.txt" in zf.namelist() else None
 
     agencies["__n"] = agencies["agency_name"].astype(str).str.lower()
     keep_ids = agencies.loc[agencies["__n"].str.contains("|".join(AGENCY_MATCH), na=False), "agency_id"].astype(str).unique().tolist()
     routes = routes[routes.get("agency_id","").astype(str).isin(keep_ids) | routes.get("agency_id").isna()]
 
     # trip first/last
-    st["stop_sequence"] = pd.to_numeric(st["stop_sequence"], errors="coerce")
+    # times are already int seconds (gtfs_io.read_table)
     st = st.dropna(subset=["stop_sequence"])
     st_sorted = st.sort_values(["trip_id","stop_sequence"])
-    firsts = st_sorted.groupby("trip_id").first().reset_index()
-    lasts  = st_sorted.groupby("trip_id").last().reset_index()
-
-    def t2s(x):
-        try: return _parse_time_to_sec(str(x))
-        except: return None
+    firsts = st_sorted.groupby("trip_id", observed=True).first().reset_index()
+    lasts  = st_sorted.groupby("trip_id", observed=True).last().reset_index()
 
-    firsts["dep_s"] = firsts["departure_time"].map(t2s)
-    lasts["arr_s"]  = lasts["arrival_time"].map(t2s)
+    firsts["dep_s"] = firsts["departure_time"]
+    lasts["arr_s"]  = lasts["arrival_time"]
 
     trip = firsts[["trip_id","stop_id","dep_s"]].merge(
         lasts[["trip_id","stop_id","arr_s"]],
         on="trip_id", suffixes=("_o","_d")
-    )
+    ).rename(columns={"stop_id_o":"origin_stop_id","stop_id_d":"destination_stop_id"})
     trips = trips[trips["route_id"].astype(str).isin(routes["route_id"].astype(str))]
     trip = trip.merge(trips[["trip_id","service_id","route_id"]], on="trip_id", how="left")
     trip["duration_s"] = (trip["arr_s"] - trip["dep_s"]).clip(lower=0)
+    trip["trips"] = 1
+    if gtfs_pairs.ALL_PAIRS:
+        # every (board, alight) pair of the operator's trips instead of first -> last stop
+        trip = gtfs_pairs.pair_rows(st, trips["trip_id"], "origin_stop_id", "destination_stop_id")
 
     stops_min = stops[["stop_id","stop_name","stop_lat","stop_lon"]].copy()
-    o = trip.merge(stops_min, left_on="stop_id_o", right_on="stop_id", how="left")
-    o = o.merge(stops_min, left_on="stop_id_d", right_on="stop_id", how="left", suffixes=("_o","_d"))
+    o = trip.merge(stops_min, left_on="origin_stop_id", right_on="stop_id", how="left")
+    o = o.merge(stops_min, left_on="destination_stop_id", right_on="stop_id", how="left", suffixes=("_o","_d"))
 
     o["origin_station"]      = o["stop_name_o"].astype(str)
     o["destination_station"] = o["stop_name_d"].astype(str)
@@ -79,13 +72,16 @@ def fetch_routes() -> pd.DataFrame:
     o["origin_country"]      = _infer_country(o["stop_lat_o"], o["stop_lon_o"])
     o["destination_country"] = _infer_country(o["stop_lat_d"], o["stop_lon_d"])
 
-    if cal is not None and "monday" in cal.columns:
+    if cal is not None and "service_id" in o.columns and "monday" in cal.columns:
         cal_use = cal[["service_id","monday","tuesday","wednesday","thursday","friday","saturday","sunday"]].copy()
-        cal_use.iloc[:,1:] = cal_use.iloc[:,1:].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+        cal_use.iloc[:,1:] = cal_use.iloc[:,1:].apply(pd.to_numeric, errors="coerce").fillna(0).astype("int8")
         o = o.merge(cal_use, on="service_id", how="left")
-        o["freq_daily"] = 1
+        o["freq_daily"] = o["trips"]
     else:
-        o["freq_daily"] = 1
+        o["freq_daily"] = o["trips"]
+    # trip-weighted mean duration (pair rows carry many trips each)
+    o["dur_w"] = o["duration_s"] * o["trips"]
+    o["dur_n"] = o["trips"].where(o["duration_s"].notna(), 0)
 
     grp = o.groupby([
         "origin_station","destination_station",
@@ -93,7 +89,18 @@ def fetch_routes() -> pd.DataFrame:
         "origin_country","destination_country"
     ], dropna=False)
 
-    agg = grp.agg(duration_s=("duration_s","mean"), trips_day=("freq_daily","sum")).reset_index()
+    agg = grp.agg(
+        dur_w=("dur_w","sum"), dur_n=("dur_n","sum"), trips_day=("freq_daily","sum"),
+        origin_lat=("stop_lat_o","first"), origin_lon=("stop_lon_o","first"),
+        dest_lat=("stop_lat_d","first"), dest_lon=("stop_lon_d","first"),
+    ).reset_index()
+    agg["duration_s"] = agg["dur_w"] / agg["dur_n"].replace(0, np.nan)
+    # departure time-of-day profile per O/D, rows in the same group order as agg
+    if gtfs_pairs.ALL_PAIRS:
+        profiles = gtfs_profiles.empty_profiles(len(agg))   # no per-trip departures
+    else:
+        profiles = gtfs_profiles.departure_profiles(grp.ngroup(), o["dep_s"], grp.ngroups)
+    agg = pd.concat([agg, profiles], axis=1)
 
     def lab(n):
         n = int(n or 0)
@@ -111,7 +118,9 @@ def fetch_routes() -> pd.DataFrame:
         "duration","frequency_daily","frequency_label",
         "origin_station","destination_station",
         "origin_city","destination_city",
-        "origin_country","destination_country"
+        "origin_country","destination_country",
+        "origin_lat","origin_lon","dest_lat","dest_lon",
+        *gtfs_profiles.PROFILE_COLUMNS
     ]].copy()
     out.insert(0, "operator_name", OPERATOR_NAME)
     out.insert(0, "transport_type", "bus")
@@ -1,8 +1,9 @@
 # connectors/bus_blablabus.py
-import io, os, re, zipfile, pandas as pd, requests
+import io, os, re, zipfile, numpy as np, pandas as pd, requests
 from connectors.bus_flixbus import (
-    _get_with_retries, _parse_time_to_sec, _sec_to_hhmm, _extract_city, _infer_country
+    _get_with_retries, _sec_to_hhmm, _extract_city, _infer_country
 )
+from connectors import gtfs_io, gtfs_pairs, gtfs_profiles
 
 # We fetch the resource page on transport.data.gouv.fr and grab the Drive URL.
 RESOURCE_PAGE = "https://transport.data.gouv.fr/resources/52605?locale=en"
@@ -30,28 +31,17 @@ def _download_gtfs_bytes() -> bytes:
         raise RuntimeError("Could not find BlaBlaCar Bus GTFS download link on resource page.")
     return _get_with_retries(drive)
 
-def _read_csv(zf: zipfile.ZipFile, name: str) -> pd.DataFrame:
-    with zf.open(name) as f:
-        data = f.read()
-    for enc in ("utf-8", "utf-8-sig", "latin-1"):
-        try:
-            return pd.read_csv(io.BytesIO(data), encoding=enc)
-        except Exception:
-            continue
-    # last resort
-    return pd.read_csv(io.BytesIO(data), encoding="utf-8", errors="ignore")
-
 def _build_df_from_gtfs(zbytes: bytes, operator_name: str, agency_regexes) -> pd.DataFrame:
     zf = zipfile.ZipFile(io.BytesIO(zbytes))
     # required files
-    agencies = _read_csv(zf, "agency.txt")
-    routes   = _read_csv(zf, "routes.txt")
-    trips    = _read_csv(zf, "trips.txt")
-    stop_times = _read_csv(zf, "stop_times.txt")
-    stops    = _read_csv(zf, "stops.txt")
+    agencies = gtfs_io.read_table(zf, "agency.txt")
+    routes   = gtfs_io.read_table(zf, "routes.txt")
+    trips    = gtfs_io.read_table(zf, "trips.txt")
+    stop_times = gtfs_io.read_table(zf, "stop_times.txt")
+    stops    = gtfs_io.read_table(zf, "stops.txt")
     cal = None
     if "calendar.txt" in zf.namelist():
-        cal = _read_csv(zf, "calendar.txt")
+        cal = gtfs_io.read_table(zf, "calendar.txt")
 
     # normalize names for matching agencies
     agencies["__n"] = agencies["agency_name"].astype(str).str.lower()
@@ -65,23 +55,23 @@ def _build_df_from_gtfs(zbytes: bytes, operator_name: str, agency_regexes) -> pd
     routes = routes[routes.get("agency_id", "").astype(str).isin(keep_agency_ids) | routes.get("agency_id").isna()]
     trips  = trips[trips["route_id"].astype(str).isin(routes["route_id"].astype(str))]
 
-    # compute trip first/last stops + duration
-    stop_times["stop_sequence"] = pd.to_numeric(stop_times["stop_sequence"], errors="coerce")
+    # compute trip first/last stops + duration (times already int seconds, see gtfs_io)
     stop_times = stop_times.dropna(subset=["stop_sequence"])
     # first and last rows per trip
-    idx_first = stop_times.sort_values(["trip_id","stop_sequence"]).groupby("trip_id").first().reset_index()
-    idx_last  = stop_times.sort_values(["trip_id","stop_sequence"]).groupby("trip_id").last().reset_index()
-
-    def _t2s(x): 
-        try: return _parse_time_to_sec(str(x))
-        except: return None
+    st_sorted = stop_times.sort_values(["trip_id","stop_sequence"])
+    idx_first = st_sorted.groupby("trip_id", observed=True).first().reset_index()
+    idx_last  = st_sorted.groupby("trip_id", observed=True).last().reset_index()
 
-    idx_first["dep_s"] = idx_first["departure_time"].map(_t2s)
-    idx_last["arr_s"]  = idx_last["arrival_time"].map(_t2s)
+    idx_first["dep_s"] = idx_first["departure_time"]
+    idx_last["arr_s"]  = idx_last["arrival_time"]
     trip_span = idx_first.merge(idx_last[["trip_id","stop_id","arr_s"]], on="trip_id", suffixes=("_orig","_dest"))
     trip_span.rename(columns={"stop_id_orig":"origin_stop_id","stop_id_dest":"destination_stop_id"}, inplace=True)
     trip_span = trip_span.merge(trips[["trip_id","route_id","service_id"]], on="trip_id", how="left")
     trip_span["duration_s"] = (trip_span["arr_s"] - trip_span["dep_s"]).clip(lower=0)
+    trip_span["trips"] = 1
+    if gtfs_pairs.ALL_PAIRS:
+        # every (board, alight) pair of the operator's trips instead of first -> last stop
+        trip_span = gtfs_pairs.pair_rows(stop_times, trips["trip_id"], "origin_stop_id", "destination_stop_id")
 
     # join stops (names + lat/lon)
     stops_min = stops[["stop_id","stop_name","stop_lat","stop_lon"]].copy()
@@ -97,26 +87,39 @@ def _build_df_from_gtfs(zbytes: bytes, operator_name: str, agency_regexes) -> pd
     o["destination_country"] = _infer_country(o["stop_lat_d"], o["stop_lon_d"])
 
     # frequency estimate: trips per typical weekday (Mon) or max-day fallback
-    freq = pd.Series(1, index=o["trip_id"]).groupby(o["trip_id"]).sum().to_frame("trip_count").reset_index()
-    o = o.merge(freq, on="trip_id", how="left")
+    if "trip_id" in o.columns:
+        freq = pd.Series(1, index=o["trip_id"]).groupby(o["trip_id"]).sum().to_frame("trip_count").reset_index()
+        o = o.merge(freq, on="trip_id", how="left")
     if cal is not None and "service_id" in o.columns and "monday" in cal.columns:
         cal_use = cal[["service_id","monday","tuesday","wednesday","thursday","friday","saturday","sunday"]].copy()
-        cal_use.iloc[:,1:] = cal_use.iloc[:,1:].apply(pd.to_numeric, errors="coerce").fillna(0).astype(int)
+        cal_use.iloc[:,1:] = cal_use.iloc[:,1:].apply(pd.to_numeric, errors="coerce").fillna(0).astype("int8")
         o = o.merge(cal_use, on="service_id", how="left")
         # trips per day = sum over services that run that day (approx)
         o["weekday_runs"] = o[["monday","tuesday","wednesday","thursday","friday"]].max(axis=1).fillna(1)
-        o["freq_daily"]   = 1  # each trip counts once; we aggregate next
+        o["freq_daily"]   = o["trips"]  # each trip counts once; we aggregate next
     else:
-        o["freq_daily"] = 1
+        o["freq_daily"] = o["trips"]
+    # trip-weighted mean duration (pair rows carry many trips each)
+    o["dur_w"] = o["duration_s"] * o["trips"]
+    o["dur_n"] = o["trips"].where(o["duration_s"].notna(), 0)
 
     # aggregate by origin/destination station
     grp = o.groupby(["origin_station","destination_station","origin_city","destination_city",
                      "origin_country","destination_country"], dropna=False)
 
     agg = grp.agg(
-        duration_s=("duration_s","mean"),
-        trips_day=("freq_daily","sum")
+        dur_w=("dur_w","sum"), dur_n=("dur_n","sum"),
+        trips_day=("freq_daily","sum"),
+        origin_lat=("stop_lat_o","first"), origin_lon=("stop_lon_o","first"),
+        dest_lat=("stop_lat_d","first"), dest_lon=("stop_lon_d","first"),
     ).reset_index()
+    agg["duration_s"] = agg["dur_w"] / agg["dur_n"].replace(0, np.nan)
+    # departure time-of-day profile per O/D, rows in the same group order as agg
+    if gtfs_pairs.ALL_PAIRS:
+        profiles = gtfs_profiles.empty_profiles(len(agg))   # no per-trip departures
+    else:
+        profiles = gtfs_profiles.departure_profiles(grp.ngroup(), o["dep_s"], grp.ngroups)
+    agg = pd.concat([agg, profiles], axis=1)
 
     # label
     def _label(n):
@@ -134,7 +137,9 @@ def _build_df_from_gtfs(zbytes: bytes, operator_name: str, agency_regexes) -> pd
         "duration","frequency_daily","frequency_label",
         "origin_station","destination_station",
         "origin_city","destination_city",
-        "origin_country","destination_country"
+        "origin_country","destination_country",
+        "origin_lat","origin_lon","dest_lat","dest_lon",
+        *gtfs_profiles.PROFILE_COLUMNS
     ]].copy()
     out.insert(0, "operator_name", operator_name)
     out.insert(0, "transport_type", "bus")
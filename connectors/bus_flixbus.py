@@ -1,7 +1,17 @@
-import io, zipfile, time, re
-import requests
+import io, os, zipfile, re
+import numpy as np
 import pandas as pd
 from ftfy import fix_text  # <--- ensures perfect accent/character repair
+from connectors.http_download import download_bytes
+from connectors import deadline
+from connectors.deadline import DeadlineExceeded
+from connectors import gtfs_checkpoint, gtfs_io, gtfs_pairs, gtfs_profiles
+
+# bump when _parse_gtfs_tables output changes, so old checkpoints are not reused
+PARSER_VERSION = 1
+
+# "1" -> emit every (board, alight) stop pair of each trip (shared flag, see connectors/gtfs_pairs.py)
+ALL_PAIRS = gtfs_pairs.ALL_PAIRS
 
 FEEDS = [
     "https://gtfs.gis.flix.tech/gtfs_generic_eu.zip",
@@ -40,18 +50,10 @@ def _infer_country(lat, lon):
             return code
     return None
 
-def _get_with_retries(url, tries=3, timeout=120):
-    err = None
-    for i in range(tries):
-        try:
-            r = requests.get(url, timeout=timeout)
-            if r.status_code == 200:
-                return r.content
-            err = f"HTTP {r.status_code}"
-        except Exception as e:
-            err = str(e)
-        time.sleep(2)
-    raise RuntimeError(f"Download failed for {url}: {err}")
+def _get_with_retries(url, tries=3, timeout=120, headers=None):
+    # resumable, backed-off download (see connectors/http_download.py); kept between runs and
+    # revalidated, so an unchanged feed costs a 304 instead of the whole archive
+    return download_bytes(url, keep=True, headers=headers, tries=tries, timeout=timeout)
 
 def _parse_time_to_sec(t):
     if pd.isna(t): return None
@@ -78,7 +80,11 @@ def _extract_city(name):
         name += ")"
     return name.strip()
 
-def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus"):
+def _parse_gtfs_tables(zip_bytes, all_pairs=False):
+    """
+    Read, repair and filter the GTFS files -> routes, trips, per-trip first/last spans, stops,
+    and with all_pairs the per-stop-pair aggregate of every boarding/alighting combination.
+    """
     z = zipfile.ZipFile(io.BytesIO(zip_bytes))
 
     def rd(name, usecols=None):
@@ -101,8 +107,13 @@ def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus"):
                     pass
                 return fix_text(val)
 
+            # once per distinct value (ids and times repeat heavily), with deadline checks in between
             for col in df.columns:
-                df[col] = df[col].apply(_fix_encoding)
+                codes, uniques = pd.factorize(df[col])
+                fixed = deadline.in_chunks(pd.Series(uniques, dtype=object), lambda u: u.map(_fix_encoding),
+                                           f"{name} text repair")
+                values = np.append(fixed.to_numpy(dtype=object), np.nan)   # code -1 (missing) -> NaN
+                df[col] = pd.Series(values[codes], index=df.index, dtype=df[col].dtype)
             return df
         except KeyError:
             return pd.DataFrame()
@@ -113,8 +124,7 @@ def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus"):
     stops = rd("stops.txt", usecols=["stop_id","stop_name","stop_lat","stop_lon"])
 
     if routes.empty or trips.empty or stop_times.empty or stops.empty:
-        print("One of the GTFS files is empty — skipping feed.")
-        return pd.DataFrame()
+        return {}
 
     routes = routes[routes["route_type"].astype(str) == "3"]
     trips = trips.merge(routes, on="route_id", how="inner")
@@ -125,24 +135,63 @@ def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus"):
     last = stop_times.groupby("trip_id").last().reset_index()[["trip_id","arrival_time","stop_id"]]
     first.columns = ["trip_id","t0","origin_stop"]
     last.columns = ["trip_id","t1","dest_stop"]
+    spans = first.merge(last, on="trip_id")
+    tables = {"routes": routes, "trips": trips, "spans": spans, "stops": stops}
+    if all_pairs:
+        st = stop_times[stop_times["trip_id"].isin(trips["trip_id"])].copy()
+        st["arrival_time"] = gtfs_io.parse_times(st["arrival_time"])
+        st["departure_time"] = gtfs_io.parse_times(st["departure_time"])
+        tables["pairs"] = gtfs_pairs.od_pairs(st)
+    return tables
+
+def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus", all_pairs=None):
+    all_pairs = ALL_PAIRS if all_pairs is None else all_pairs
+    # everything up to the trip spans is checkpointed per archive; O/D logic below re-runs cheaply
+    tables = gtfs_checkpoint.cached(zip_bytes, feed_label + ("/pairs" if all_pairs else ""), PARSER_VERSION,
+                                    lambda: _parse_gtfs_tables(zip_bytes, all_pairs=all_pairs))
+    if not tables:
+        print("One of the GTFS files is empty — skipping feed.")
+        return pd.DataFrame()
+    stops = tables["stops"]
 
-    merged = trips.merge(first, on="trip_id").merge(last, on="trip_id")
+    if all_pairs:
+        # already one row per stop pair with its trip count and mean duration
+        merged = tables["pairs"].rename(columns={"trip_count": "trips"})
+    else:
+        merged = tables["trips"].merge(tables["spans"], on="trip_id")
     merged = merged.merge(stops.rename(columns={"stop_id":"origin_stop","stop_name":"origin_station","stop_lat":"origin_lat","stop_lon":"origin_lon"}), on="origin_stop", how="left")
     merged = merged.merge(stops.rename(columns={"stop_id":"dest_stop","stop_name":"destination_station","stop_lat":"dest_lat","stop_lon":"dest_lon"}), on="dest_stop", how="left")
 
-    merged["dur_sec"] = merged.apply(
-        lambda r: (_parse_time_to_sec(r["t1"]) - _parse_time_to_sec(r["t0"]))
-        if (_parse_time_to_sec(r["t1"]) and _parse_time_to_sec(r["t0"])) else None,
-        axis=1
-    )
+    # the row-wise applies below run in slices so an over-budget run stops between them
+    what = f"{feed_label} routes"
+    if not all_pairs:
+        merged["dur_sec"] = deadline.in_chunks(merged, lambda part: part.apply(
+            lambda r: (_parse_time_to_sec(r["t1"]) - _parse_time_to_sec(r["t0"]))
+            if (_parse_time_to_sec(r["t1"]) and _parse_time_to_sec(r["t0"])) else None,
+            axis=1
+        ), what)
+        merged["trips"] = 1
     merged = merged[(merged["dur_sec"].notna()) & (merged["dur_sec"] > 0) & (merged["dur_sec"] < 48*3600)]
 
-    merged["origin_city"] = merged["origin_station"].apply(_extract_city)
-    merged["destination_city"] = merged["destination_station"].apply(_extract_city)
-    merged["origin_country"] = merged.apply(lambda r: _infer_country(r["origin_lat"], r["origin_lon"]), axis=1)
-    merged["destination_country"] = merged.apply(lambda r: _infer_country(r["dest_lat"], r["dest_lon"]), axis=1)
-
-    freq = merged.groupby(["origin_city","destination_city"]).size().reset_index(name="trip_count")
+    merged["origin_city"] = deadline.in_chunks(merged["origin_station"], lambda s: s.apply(_extract_city), what)
+    merged["destination_city"] = deadline.in_chunks(merged["destination_station"], lambda s: s.apply(_extract_city), what)
+    merged["origin_country"] = deadline.in_chunks(
+        merged, lambda part: part.apply(lambda r: _infer_country(r["origin_lat"], r["origin_lon"]), axis=1), what)
+    merged["destination_country"] = deadline.in_chunks(
+        merged, lambda part: part.apply(lambda r: _infer_country(r["dest_lat"], r["dest_lon"]), axis=1), what)
+
+    by_city = merged.groupby(["origin_city","destination_city"])
+    freq = by_city["trips"].sum().reset_index(name="trip_count")
+    # time-of-day profile per city pair from the same grouping (needs per-trip departures)
+    if all_pairs:
+        profiles = gtfs_profiles.empty_profiles(len(freq))
+    else:
+        # rows with a missing city are in no group: ngroup() gives NaN there, -1 after fillna
+        codes = by_city.ngroup().fillna(-1).astype("int64")
+        keep = codes >= 0
+        profiles = gtfs_profiles.departure_profiles(codes[keep], gtfs_io.parse_times(merged.loc[keep, "t0"]),
+                                                    by_city.ngroups)
+    freq = pd.concat([freq, profiles], axis=1)
 
     def freq_bucket(x):
         if x <= 5: return "Very Low"
@@ -161,7 +210,9 @@ def _parse_gtfs_zip(zip_bytes, feed_label="FlixBus"):
     cols = [
         "origin_city","origin_country","origin_station",
         "destination_city","destination_country","destination_station",
-        "operator_name","duration","trip_count","frequency_bucket"
+        "operator_name","duration","trip_count","frequency_bucket",
+        "origin_lat","origin_lon","dest_lat","dest_lon",
+        *gtfs_profiles.PROFILE_COLUMNS
     ]
     df = merged[cols].drop_duplicates(subset=["origin_city","destination_city"])
     print(f"Fetched {len(df)} routes from {feed_label}.")
@@ -179,6 +230,8 @@ def fetch_routes():
             if not df.empty:
                 frames.append(df)
                 print(f"  -> {len(df):,} rows from {label}")
+        except DeadlineExceeded:
+            raise   # a partial feed set must not pass for a complete one
         except Exception as e:
             print(f"  -> Skipped {url}: {e}")
 
@@ -186,7 +239,9 @@ def fetch_routes():
         return pd.DataFrame(columns=[
             "origin_city","origin_country","origin_station",
             "destination_city","destination_country","destination_station",
-            "operator_name","duration","trip_count","frequency_bucket"
+            "operator_name","duration","trip_count","frequency_bucket",
+            "origin_lat","origin_lon","dest_lat","dest_lon",
+            *gtfs_profiles.PROFILE_COLUMNS
         ])
 
     out = pd.concat(frames, ignore_index=True).drop_duplicates()
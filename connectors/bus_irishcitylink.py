@@ -1,26 +1,21 @@
 # connectors/bus_irishcitylink.py
 import io, zipfile
 import pandas as pd
-import requests
+from connectors.http_download import download_bytes
+from connectors import gtfs_checkpoint, gtfs_io, gtfs_pairs, gtfs_profiles
 from connectors.bus_flixbus import (
     _parse_time_to_sec, _sec_to_hhmm, _extract_city, _infer_country
 )
 
 TFI_GTFS_ALL = "https://www.transportforireland.ie/transitData/Data/GTFS_All.zip"
 OPERATOR_NAME = "Irish Citylink"
+PARSER_VERSION = 1  # bump when _parse_tables output changes
 AGENCY_MATCH  = ["citylink"]  # agency_name usually includes 'Citylink'
 
 def _http_get(url, tries=3, timeout=180):
-    err = None
-    for _ in range(tries):
-        try:
-            r = requests.get(url, timeout=timeout, allow_redirects=True)
-            if r.status_code == 200:
-                return r.content
-            err = f"HTTP {r.status_code}"
-        except Exception as e:
-            err = str(e)
-    raise RuntimeError(f"Download failed: {err}")
+    # multi-hundred-MB feed: resume from the partial file instead of restarting at byte zero;
+    # the archive is kept so an unchanged feed (304) goes straight to the parsed checkpoint
+    return download_bytes(url, keep=True, tries=tries, timeout=timeout)
 
 def _read_csv(zf: zipfile.ZipFile, name: str, usecols=None):
     with zf.open(name) as f:
@@ -32,11 +27,11 @@ def _read_csv(zf: zipfile.ZipFile, name: str, usecols=None):
             continue
     return pd.read_csv(io.BytesIO(raw), encoding="utf-8", dtype=str, usecols=usecols, low_memory=False, errors="ignore")
 
-def _first_last_from_stop_times(zf: zipfile.ZipFile, keep_trip_ids: set, chunksize=300_000):
+def _first_last_from_stop_times(zf: zipfile.ZipFile, keep_trip_ids: set, budget_mb=None):
     cols = ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]
     first_parts, last_parts = [], []
     with zf.open("stop_times.txt") as fh:
-        reader = pd.read_csv(fh, dtype=str, usecols=cols, chunksize=chunksize, low_memory=False, encoding="latin-1")
+        reader = gtfs_io.iter_csv_chunks(fh, budget_mb=budget_mb, dtype=str, usecols=cols, low_memory=False, encoding="latin-1")
         for chunk in reader:
             if keep_trip_ids:
                 chunk = chunk[chunk["trip_id"].isin(keep_trip_ids)]
@@ -59,7 +54,29 @@ def _first_last_from_stop_times(zf: zipfile.ZipFile, keep_trip_ids: set, chunksi
     last_all  = last_all.sort_values(["trip_id","seq1"]).groupby("trip_id", as_index=False).last()
     return first_all, last_all
 
-def _build_df(zbytes: bytes) -> pd.DataFrame:
+def _pairs_from_stop_times(zf: zipfile.ZipFile, keep_trip_ids: set, budget_mb=None):
+    """Stream stop_times.txt, keep the operator's rows and expand every (board, alight) pair."""
+    cols = ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]
+    parts = []
+    with zf.open("stop_times.txt") as fh:
+        for chunk in gtfs_io.iter_csv_chunks(fh, budget_mb=budget_mb, dtype=str, usecols=cols,
+                                             low_memory=False, encoding="latin-1"):
+            if keep_trip_ids:
+                chunk = chunk[chunk["trip_id"].isin(keep_trip_ids)]
+                if chunk.empty:
+                    continue
+            chunk = chunk.assign(
+                stop_sequence=pd.to_numeric(chunk["stop_sequence"], errors="coerce"),
+                arrival_time=gtfs_io.parse_times(chunk["arrival_time"]),
+                departure_time=gtfs_io.parse_times(chunk["departure_time"]),
+            )
+            parts.append(chunk)
+    if not parts:
+        return pd.DataFrame()
+    return gtfs_pairs.od_pairs(pd.concat(parts, ignore_index=True), budget_mb=budget_mb)
+
+def _parse_tables(zbytes: bytes, all_pairs=False) -> dict:
+    """Operator-filtered trips, per-trip first/last spans (or all stop pairs) and stops (checkpointed per archive)."""
     zf = zipfile.ZipFile(io.BytesIO(zbytes))
 
     agencies = _read_csv(zf, "agency.txt", usecols=["agency_id","agency_name"])
@@ -77,13 +94,35 @@ def _build_df(zbytes: bytes) -> pd.DataFrame:
     trips = trips[trips["route_id"].isin(routes["route_id"])]
     keep_trip_ids = set(trips["trip_id"].tolist())
 
+    if all_pairs:
+        pairs = _pairs_from_stop_times(zf, keep_trip_ids)
+        if pairs.empty:
+            return {}
+        stops = _read_csv(zf, "stops.txt", usecols=["stop_id","stop_name","stop_lat","stop_lon"])
+        return {"pairs": pairs, "stops": stops}
+
     first, last = _first_last_from_stop_times(zf, keep_trip_ids)
     if first.empty or last.empty:
-        return pd.DataFrame()
-
-    merged = trips.merge(first, on="trip_id", how="inner").merge(last, on="trip_id", how="inner")
+        return {}
 
+    spans = first.merge(last, on="trip_id", how="inner")
     stops = _read_csv(zf, "stops.txt", usecols=["stop_id","stop_name","stop_lat","stop_lon"])
+    return {"trips": trips, "spans": spans, "stops": stops}
+
+def _build_df(zbytes: bytes, all_pairs=None) -> pd.DataFrame:
+    all_pairs = gtfs_pairs.ALL_PAIRS if all_pairs is None else all_pairs
+    tables = gtfs_checkpoint.cached(zbytes, OPERATOR_NAME + ("/pairs" if all_pairs else ""), PARSER_VERSION,
+                                    lambda: _parse_tables(zbytes, all_pairs=all_pairs))
+    if not tables:
+        return pd.DataFrame()
+    stops = tables["stops"]
+
+    if all_pairs:
+        # already one row per stop pair with its trip count and mean duration
+        merged = tables["pairs"].rename(columns={"origin_stop":"origin_stop_id", "dest_stop":"destination_stop_id",
+                                                 "trip_count":"trips", "dur_sec":"dur_s"})
+    else:
+        merged = tables["trips"].merge(tables["spans"], on="trip_id", how="inner")
     o = merged.merge(stops.rename(columns={"stop_id":"origin_stop_id",
                                            "stop_name":"origin_station",
                                            "stop_lat":"origin_lat",
@@ -96,7 +135,10 @@ def _build_df(zbytes: bytes) -> pd.DataFrame:
     def t2s(x): 
         s = _parse_time_to_sec(x)
         return s if s is not None else -1
-    o["dur_s"] = (o["t1"].map(t2s) - o["t0"].map(t2s))
+    if not all_pairs:
+        o["dep_s"] = o["t0"].map(t2s)
+        o["dur_s"] = (o["t1"].map(t2s) - o["dep_s"])
+        o["trips"] = 1
     o = o[(o["dur_s"] > 0) & (o["dur_s"] < 48*3600)]
 
     o["origin_city"] = o["origin_station"].map(_extract_city)
@@ -107,7 +149,7 @@ def _build_df(zbytes: bytes) -> pd.DataFrame:
     freq = o.groupby(
         ["origin_station","destination_station","origin_city","destination_city","origin_country","destination_country"],
         dropna=False
-    ).size().reset_index(name="frequency_daily")
+    )["trips"].sum().reset_index(name="frequency_daily")
 
     def label(n: int):
         if n <= 5: return "Very Low (0-5)"
@@ -118,11 +160,24 @@ def _build_df(zbytes: bytes) -> pd.DataFrame:
 
     freq["frequency_label"] = freq["frequency_daily"].astype(int).map(label)
 
-    durs = o.groupby(
+    o["dur_w"] = o["dur_s"] * o["trips"]   # trip-weighted mean (pair rows carry many trips)
+    grp = o.groupby(
         ["origin_station","destination_station","origin_city","destination_city","origin_country","destination_country"],
         dropna=False
-    )["dur_s"].mean().reset_index()
+    )
+    durs = grp.agg(
+        dur_w=("dur_w","sum"), n=("trips","sum"),
+        origin_lat=("origin_lat","first"), origin_lon=("origin_lon","first"),
+        dest_lat=("dest_lat","first"), dest_lon=("dest_lon","first"),
+    ).reset_index()
+    durs["dur_s"] = durs["dur_w"] / durs["n"]
     durs["duration"] = durs["dur_s"].round().astype(int).map(_sec_to_hhmm)
+    # departure time-of-day profile per O/D, rows in the same group order as durs
+    if all_pairs:
+        profiles = gtfs_profiles.empty_profiles(len(durs))   # no per-trip departures
+    else:
+        profiles = gtfs_profiles.departure_profiles(grp.ngroup(), o["dep_s"].where(o["dep_s"] >= 0), grp.ngroups)
+    durs = pd.concat([durs, profiles], axis=1)
 
     out = durs.merge(freq, on=["origin_station","destination_station","origin_city","destination_city","origin_country","destination_country"], how="left")
     out.insert(0, "operator_name", OPERATOR_NAME)
@@ -130,7 +185,9 @@ def _build_df(zbytes: bytes) -> pd.DataFrame:
     return out[[
         "transport_type","operator_name","duration","frequency_daily","frequency_label",
         "origin_station","destination_station","origin_city","destination_city",
-        "origin_country","destination_country"
+        "origin_country","destination_country",
+        "origin_lat","origin_lon","dest_lat","dest_lon",
+        *gtfs_profiles.PROFILE_COLUMNS
     ]]
 
 def fetch_routes() -> pd.DataFrame:
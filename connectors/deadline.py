@@ -0,0 +1,60 @@
+# connectors/deadline.py
+import time, contextvars
+from contextlib import contextmanager
+import pandas as pd
+
+# Wall-clock deadline of the connector currently running (monotonic seconds, None = no limit).
+# Long loops call check(); network calls cap their timeouts with timeout(); the runner in
+# scripts/connector_runner.py sets it per connector.
+_deadline = contextvars.ContextVar("connector_deadline", default=None)
+# rows per slice for in_chunks(): small enough that a slice of per-row Python work takes ~1s
+CHUNK_ROWS = 50_000
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+@contextmanager
+def budget(seconds):
+    """Run the enclosed block under a wall-clock budget (None/0 = unlimited)."""
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining():
+    d = _deadline.get()
+    return None if d is None else d - time.monotonic()
+
+def expired() -> bool:
+    r = remaining()
+    return r is not None and r <= 0
+
+def check(what="connector"):
+    """Cooperative cancellation point: raise DeadlineExceeded once the budget is spent."""
+    if expired():
+        raise DeadlineExceeded(f"{what}: time budget exhausted")
+
+def timeout(seconds):
+    """A request timeout that never runs past the deadline (at least 1s)."""
+    r = remaining()
+    return seconds if r is None else max(1.0, min(seconds, r))
+
+def sleep(seconds):
+    r = remaining()
+    time.sleep(seconds if r is None else max(0.0, min(seconds, r)))
+    check()
+
+def in_chunks(obj, fn, what="connector", rows=CHUNK_ROWS):
+    """
+    fn(obj) for per-row Python work (apply/map) run slice by slice with a check() in between,
+    so it can be cancelled. fn must return a Series/frame aligned to the slice's index.
+    """
+    if len(obj) <= rows:
+        check(what)
+        return fn(obj)
+    parts = []
+    for start in range(0, len(obj), rows):
+        check(what)
+        parts.append(fn(obj.iloc[start:start + rows]))
+    return pd.concat(parts)
@@ -0,0 +1,65 @@
+# connectors/gtfs_checkpoint.py
+import os, hashlib, shutil
+
+# Parsed GTFS tables are checkpointed here as uncompressed Feather (Arrow IPC), one directory
+# per (connector, archive hash, parser version). Delete the directory to force a re-parse.
+# Archives are kept by http_download (keep=True), so an unchanged feed costs a 304, not a download.
+CHECKPOINT_DIR = os.getenv("GTFS_CHECKPOINT_DIR", os.path.join("data", "cache", "gtfs"))
+ENABLED = os.getenv("GTFS_CHECKPOINTS", "1") != "0"
+DONE_MARKER = "_COMPLETE"
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # checkpoints are an optimisation only
+    feather = None
+
+def archive_key(zip_bytes: bytes, label: str, parser_version) -> str:
+    digest = hashlib.sha256(zip_bytes).hexdigest()[:20]
+    safe = "".join(ch if ch.isalnum() else "_" for ch in label)
+    return f"{safe}_{digest}_v{parser_version}"
+
+def _dir(key):
+    return os.path.join(CHECKPOINT_DIR, key)
+
+def load(key: str):
+    """Return {name: DataFrame} for a complete checkpoint, else None. Files are memory-mapped."""
+    if not ENABLED or feather is None:
+        return None
+    d = _dir(key)
+    if not os.path.exists(os.path.join(d, DONE_MARKER)):
+        return None
+    tables = {}
+    for f in sorted(os.listdir(d)):
+        if f.endswith(".feather"):
+            tables[f[:-len(".feather")]] = feather.read_table(os.path.join(d, f), memory_map=True).to_pandas()
+    print(f"  -> Reused parsed GTFS checkpoint {key}")
+    return tables
+
+def save(key: str, tables: dict):
+    """Write {name: DataFrame}; the marker is written last so a crash never leaves a half checkpoint."""
+    if not ENABLED or feather is None:
+        return
+    d = _dir(key)
+    shutil.rmtree(d, ignore_errors=True)
+    os.makedirs(d, exist_ok=True)
+    try:
+        for name, df in tables.items():
+            # uncompressed so load() can map the buffers instead of decompressing them
+            feather.write_feather(df.reset_index(drop=True), os.path.join(d, f"{name}.feather"),
+                                  compression="uncompressed")
+        open(os.path.join(d, DONE_MARKER), "w").close()
+    except Exception as e:
+        print(f"  -> Could not write GTFS checkpoint {key}: {e}")
+        shutil.rmtree(d, ignore_errors=True)
+
+def cached(zip_bytes: bytes, label: str, parser_version, parse):
+    """
+    Return parse() output ({name: DataFrame}) for this archive, from the checkpoint when one
+    exists for the same archive bytes and parser version, otherwise parsing and saving it.
+    """
+    key = archive_key(zip_bytes, label, parser_version)
+    tables = load(key)
+    if tables is None:
+        tables = parse()
+        save(key, tables)
+    return tables
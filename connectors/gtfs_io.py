@@ -0,0 +1,167 @@
+# connectors/gtfs_io.py
+import os
+import pandas as pd
+from connectors import deadline
+
+# Memory budget (MB) for one streamed chunk *including* the working copies made while
+# grouping it. Unset -> a quarter of the memory currently available, capped at 2 GB.
+MEMORY_BUDGET_MB = os.getenv("GTFS_MEMORY_BUDGET_MB")
+WORKING_SET_FACTOR = 4        # chunk bytes x this ~= peak while filtering/grouping a chunk
+PROBE_ROWS = 20_000
+MIN_CHUNK_ROWS = 10_000
+MAX_CHUNK_ROWS = 5_000_000
+
+def _available_mb():
+    """MemAvailable from /proc/meminfo (Linux runners); None elsewhere."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except Exception:
+        pass
+    return None
+
+def memory_budget_mb(budget_mb=None):
+    if budget_mb:
+        return float(budget_mb)
+    if MEMORY_BUDGET_MB:
+        return float(MEMORY_BUDGET_MB)
+    avail = _available_mb()
+    return min(2048.0, avail / 4) if avail else 512.0
+
+def _rows_for(budget_mb, bytes_per_row):
+    rows = int(budget_mb * 1024 * 1024 / (max(bytes_per_row, 1) * WORKING_SET_FACTOR))
+    return max(MIN_CHUNK_ROWS, min(MAX_CHUNK_ROWS, rows))
+
+def iter_csv_chunks(fh, budget_mb=None, **read_csv_kwargs):
+    """
+    Like pd.read_csv(fh, chunksize=N) but N is derived from the memory budget and the
+    measured in-memory bytes per row, re-measured every chunk. If free memory drops below
+    what the next chunk needs, the chunk size is halved (down to MIN_CHUNK_ROWS).
+    """
+    budget = memory_budget_mb(budget_mb)
+    reader = pd.read_csv(fh, iterator=True, **read_csv_kwargs)
+    size = PROBE_ROWS
+    try:
+        while True:
+            try:
+                chunk = reader.get_chunk(size)
+            except StopIteration:
+                break
+            if chunk.empty:
+                break
+            deadline.check("GTFS stream")
+            bytes_per_row = chunk.memory_usage(index=True, deep=True).sum() / len(chunk)
+            size = _rows_for(budget, bytes_per_row)
+            avail = _available_mb()
+            if avail is not None:
+                need_mb = size * bytes_per_row * WORKING_SET_FACTOR / (1024 * 1024)
+                while need_mb > avail / 2 and size > MIN_CHUNK_ROWS:   # memory pressure
+                    size = max(MIN_CHUNK_ROWS, size // 2)
+                    need_mb /= 2
+            yield chunk
+    finally:
+        reader.close()
+
+# ---- Typed GTFS table loading ----
+# Per-file column spec: only these columns are read, ids become categoricals, times become
+# int seconds since service-day midnight, sequences small ints, coordinates float32.
+# "str" = plain text (names, which are not repeated enough to be worth a category).
+GTFS_COLUMNS = {
+    "agency.txt":     {"agency_id": "id", "agency_name": "str"},
+    "routes.txt":     {"route_id": "id", "agency_id": "id", "route_type": "int"},
+    "trips.txt":      {"route_id": "id", "service_id": "id", "trip_id": "id"},
+    "stop_times.txt": {"trip_id": "id", "arrival_time": "time", "departure_time": "time",
+                       "stop_id": "id", "stop_sequence": "int"},
+    "stops.txt":      {"stop_id": "id", "stop_name": "str", "stop_lat": "float", "stop_lon": "float"},
+    "calendar.txt":   {"service_id": "id", "monday": "int", "tuesday": "int", "wednesday": "int",
+                       "thursday": "int", "friday": "int", "saturday": "int", "sunday": "int"},
+}
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pc = pacsv = None
+
+_TIME_RX = r"^\s*(?P<h>\d+):(?P<m>\d{1,2})(?::(?P<s>\d{1,2}))?\s*$"
+
+def parse_times(s: pd.Series) -> pd.Series:
+    """'H:MM:SS' / 'HH:MM' (hours may exceed 24) -> nullable Int32 seconds, vectorized."""
+    if pc is not None:
+        arr = pa.array(s.astype(object), type=pa.string(), from_pandas=True)
+        m = pc.extract_regex(arr, _TIME_RX)   # non-matching -> null
+        num = lambda f: pc.cast(pc.if_else(pc.equal(pc.struct_field(m, f), ""), "0",
+                                           pc.struct_field(m, f)), pa.int32())
+        secs = pc.add(pc.add(pc.multiply(num("h"), 3600), pc.multiply(num("m"), 60)), num("s"))
+        return pd.Series(secs.to_pandas(), index=s.index, name=s.name).astype("Int32")
+    parts = s.astype("string").str.strip().str.split(":", n=2, expand=True)
+    parts = parts.reindex(columns=[0, 1, 2]).apply(pd.to_numeric, errors="coerce")
+    secs = parts[0] * 3600 + parts[1] * 60 + parts[2].fillna(0)
+    return secs.round().astype("Int32")
+
+def _small_int(s: pd.Series) -> pd.Series:
+    n = pd.to_numeric(s, errors="coerce")
+    hi = n.abs().max() if len(n) else 0
+    kind = "int16" if pd.isna(hi) or hi < 2**15 else "int32"
+    return n.astype(kind.capitalize()) if n.isna().any() else n.astype(kind)
+
+def apply_spec(df: pd.DataFrame, name: str, categorical=True) -> pd.DataFrame:
+    """Convert text columns read with dtype=str to the compact types in GTFS_COLUMNS[name]."""
+    spec = GTFS_COLUMNS.get(name, {})
+    for col in df.columns:
+        kind = spec.get(col)
+        if kind == "id" and categorical:
+            df[col] = df[col].astype("category")
+        elif kind == "time":
+            df[col] = parse_times(df[col])
+        elif kind == "int":
+            df[col] = _small_int(df[col])
+        elif kind == "float":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    return df
+
+def _header(zf, name, encoding):
+    with zf.open(name) as fh:
+        line = fh.readline().decode(encoding, errors="ignore")
+    return [c.strip().strip('"').lstrip("\ufeff") for c in line.strip("\r\n").split(",")]
+
+def _read_csv(fh, encoding, text, usecols):
+    if pacsv is None:
+        return pd.read_csv(fh, encoding=encoding, dtype=text, usecols=usecols)
+    # pyarrow directly: pandas' pyarrow engine infers numbers first and only then applies
+    # dtype=str, which turns "0123" into "123" and long ids into floats
+    table = pacsv.read_csv(
+        fh,
+        read_options=pacsv.ReadOptions(encoding=encoding),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=usecols or [],
+            column_types={c: pa.string() for c in text},
+            strings_can_be_null=True,   # empty -> missing, as with pd.read_csv
+        ),
+    )
+    return table.to_pandas()
+
+def read_table(zf, name: str, columns=None, categorical=True) -> pd.DataFrame:
+    """
+    Read one GTFS file from the archive with only the spec'd columns (or `columns`) and
+    compact dtypes. Text is read as str first (ids like "0123" must keep their zeros),
+    then converted by apply_spec. Tries utf-8, utf-8-sig, latin-1 like the old readers.
+    """
+    wanted = list(columns or GTFS_COLUMNS.get(name, {}))
+    err = None
+    for enc in ("utf-8", "utf-8-sig", "latin-1"):
+        try:
+            present = _header(zf, name, enc)
+            usecols = [c for c in wanted if c in present] if wanted else None
+            spec = GTFS_COLUMNS.get(name, {})
+            # numbers are left to the CSV parser's own inference (fast); everything else is text
+            text = {c: str for c in (usecols or present) if spec.get(c) not in ("int", "float")}
+            with zf.open(name) as fh:
+                df = _read_csv(fh, enc, text, usecols)
+            return apply_spec(df, name, categorical=categorical)
+        except Exception as e:
+            err = e
+    raise RuntimeError(f"Could not read {name}: {err}")
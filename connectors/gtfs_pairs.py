@@ -0,0 +1,103 @@
+# connectors/gtfs_pairs.py
+import os
+import numpy as np
+import pandas as pd
+from connectors import gtfs_io, deadline
+
+# Rough peak bytes per expanded (board, alight) pair inside a batch: index arrays, times,
+# keys and the np.unique workspace. Used to turn GTFS_MEMORY_BUDGET_MB into a batch size.
+BYTES_PER_PAIR = 96
+MAX_DURATION_S = 48 * 3600
+
+# "1" -> GTFS connectors emit every (board, alight) stop pair of each trip, not just first -> last stop
+ALL_PAIRS = os.getenv("GTFS_ALL_PAIRS", "0") == "1"
+
+def _pairs_per_batch(budget_mb=None):
+    return max(100_000, int(gtfs_io.memory_budget_mb(budget_mb) * 1024 * 1024 / BYTES_PER_PAIR))
+
+def _compact(parts):
+    if len(parts) == 1:
+        return parts[0]
+    df = pd.concat(parts, ignore_index=True)
+    return df.groupby("key", sort=False, as_index=False)[["trips", "dur_sum"]].sum()
+
+def od_pairs(stop_times: pd.DataFrame, budget_mb=None) -> pd.DataFrame:
+    """
+    Every (board, alight) stop pair served by each trip, aggregated over trips:
+    -> origin_stop, dest_stop, trip_count, dur_sec (mean of arrival[alight] - departure[board]).
+
+    `stop_times` needs trip_id, stop_id, stop_sequence and arrival_time/departure_time as
+    seconds. Pairs are generated with per-trip cumulative indexing (np.repeat over the
+    number of later stops on the trip) in batches of whole trips sized to the memory budget,
+    and each batch is reduced to per-pair sums before the next one is expanded.
+    """
+    st = stop_times.dropna(subset=["stop_sequence"])
+    st = st.sort_values(["trip_id", "stop_sequence"], kind="mergesort")
+    n = len(st)
+    if n == 0:
+        return pd.DataFrame(columns=["origin_stop", "dest_stop", "trip_count", "dur_sec"])
+
+    trip = pd.factorize(st["trip_id"])[0]
+    stop, stop_ids = pd.factorize(st["stop_id"])
+    n_stops = np.int64(len(stop_ids))
+    arr = pd.to_numeric(st["arrival_time"], errors="coerce").to_numpy(dtype=np.float64)
+    dep = pd.to_numeric(st["departure_time"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # trip boundaries in the sorted rows; `later[r]` = stops after row r on its trip
+    starts = np.flatnonzero(np.r_[True, trip[1:] != trip[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    pos = np.arange(n) - np.repeat(starts, lengths)
+    later = np.repeat(lengths, lengths) - pos - 1
+
+    # cut into batches of whole trips, each expanding to ~budget pairs
+    per_trip = lengths * (lengths - 1) // 2
+    batch = (np.cumsum(per_trip) - per_trip) // _pairs_per_batch(budget_mb)
+    cuts = np.flatnonzero(np.r_[True, batch[1:] != batch[:-1]])
+    row_bounds = np.r_[starts[cuts], n]
+
+    parts, pending = [], 0
+    for lo, hi in zip(row_bounds[:-1], row_bounds[1:]):
+        deadline.check("GTFS pair expansion")
+        k = later[lo:hi]
+        total = int(k.sum())
+        if total == 0:
+            continue
+        board = np.repeat(np.arange(lo, hi), k)
+        first = np.repeat(np.cumsum(k) - k, k)
+        alight = board + 1 + (np.arange(total) - first)
+
+        dur = arr[alight] - dep[board]
+        ok = (dur > 0) & (dur < MAX_DURATION_S) & (stop[board] != stop[alight])
+        key = stop[board[ok]].astype(np.int64) * n_stops + stop[alight[ok]]
+        uniq, inv = np.unique(key, return_inverse=True)
+        parts.append(pd.DataFrame({
+            "key": uniq,
+            "trips": np.bincount(inv),
+            "dur_sum": np.bincount(inv, weights=dur[ok]),
+        }))
+        pending += len(uniq)
+        if pending > _pairs_per_batch(budget_mb):   # keep the partial aggregates bounded too
+            parts, pending = [_compact(parts)], 0
+
+    if not parts:
+        return pd.DataFrame(columns=["origin_stop", "dest_stop", "trip_count", "dur_sec"])
+    agg = _compact(parts)
+    keys = agg["key"].to_numpy()
+    return pd.DataFrame({
+        "origin_stop": np.asarray(stop_ids)[keys // n_stops],
+        "dest_stop": np.asarray(stop_ids)[keys % n_stops],
+        "trip_count": agg["trips"].to_numpy(),
+        "dur_sec": agg["dur_sum"].to_numpy() / agg["trips"].to_numpy(),
+    })
+
+def pair_rows(stop_times: pd.DataFrame, trip_ids, origin_col: str, dest_col: str, budget_mb=None) -> pd.DataFrame:
+    """
+    od_pairs() of the given trips shaped like a connector's per-trip first/last rows:
+    origin_col, dest_col, duration_s, trips (trips behind the row) and dep_s, which is
+    missing because pair rows are already aggregated over trips.
+    """
+    pairs = od_pairs(stop_times[stop_times["trip_id"].isin(trip_ids)], budget_mb=budget_mb)
+    out = pairs.rename(columns={"origin_stop": origin_col, "dest_stop": dest_col,
+                                "trip_count": "trips", "dur_sec": "duration_s"})
+    out["dep_s"] = np.nan
+    return out
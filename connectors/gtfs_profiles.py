@@ -0,0 +1,86 @@
+# connectors/gtfs_profiles.py
+import numpy as np
+import pandas as pd
+
+# Per-O/D departure time-of-day profile, appended to the connector outputs:
+#   first_departure / last_departure  "HH:MM", in service-day order, shown as time of day
+#                                     (a 25:10 GTFS departure is last and shows as "01:10")
+#   headway_p10/p50/p90_min           minutes between consecutive distinct departure times
+#                                     (nearest-rank percentiles over the service day)
+#   departures_by_hour                24 chars, one per hour 00..23, count in base 62 (z = 61+)
+PROFILE_COLUMNS = [
+    "first_departure", "last_departure",
+    "headway_p10_min", "headway_p50_min", "headway_p90_min",
+    "departures_by_hour",
+]
+HEADWAY_PCTS = (10, 50, 90)
+DAY_S = 86400
+_DIGITS = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"))
+
+_CLOCK = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(DAY_S // 60)] + [None], dtype=object)
+
+def _hhmm(sec) -> np.ndarray:
+    # seconds of day -> "HH:MM" by table lookup; negative = missing
+    sec = np.asarray(sec, dtype=np.int64)
+    return _CLOCK[np.where(sec >= 0, sec // 60, len(_CLOCK) - 1)]
+
+def empty_profiles(n) -> pd.DataFrame:
+    """All-missing profile columns (e.g. for rows built without per-trip departures)."""
+    df = pd.DataFrame({c: pd.Series([None] * n, dtype=object) for c in PROFILE_COLUMNS})
+    for p in HEADWAY_PCTS:
+        df[f"headway_p{p}_min"] = pd.array([pd.NA] * n, dtype="Int16")
+    return df
+
+def departure_profiles(codes, dep_s, n_groups) -> pd.DataFrame:
+    """
+    Profiles for n_groups O/D groups, row i = group code i (e.g. GroupBy.ngroup(), so the
+    result lines up with the connector's own .agg() output). `codes` and `dep_s` are per
+    trip; negative codes and missing times are ignored. One bincount over (group, hour)
+    gives the histogram; first/last/headways come from one sort of the distinct times, kept
+    unwrapped (23:00 then 25:00 is a 2 h gap, not 22 h).
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    dep = pd.to_numeric(pd.Series(np.asarray(dep_s)), errors="coerce").to_numpy(dtype=np.float64)
+    ok = (codes >= 0) & np.isfinite(dep) & (dep >= 0)
+    codes, sec = codes[ok], dep[ok].astype(np.int64)
+    if not len(sec):
+        # no usable departure at all: every group gets the all-missing profile
+        return empty_profiles(n_groups)
+    tod = sec % DAY_S
+
+    hist = np.bincount(codes * 24 + tod // 3600, minlength=n_groups * 24).reshape(n_groups, 24)
+    hist = np.ascontiguousarray(_DIGITS[np.minimum(hist, len(_DIGITS) - 1)]).view("<U24").ravel()
+
+    # distinct departure times (service-day seconds), sorted by (group, time)
+    span = int(sec.max()) + 1 if len(sec) else 1
+    key = np.sort(codes * span + sec)
+    key = key[np.r_[True, key[1:] != key[:-1]]]
+    g, t = key // span, key % span
+    n = np.bincount(g, minlength=n_groups)
+    start = np.cumsum(n) - n
+    has = n > 0
+    first = np.full(n_groups, -1, dtype=np.int64)
+    last = np.full(n_groups, -1, dtype=np.int64)
+    first[has] = t[start[has]] % DAY_S
+    last[has] = t[start[has] + n[has] - 1] % DAY_S
+
+    # gaps between consecutive departures of the same group, sorted within each group
+    same = g[1:] == g[:-1]
+    gap, gg = (t[1:] - t[:-1])[same], g[1:][same]
+    both = np.sort(gg * span + gap)
+    gg, gap = both // span, both % span
+    m = np.bincount(gg, minlength=n_groups)
+    s = np.cumsum(m) - m
+
+    out = pd.DataFrame({
+        "first_departure": _hhmm(first),
+        "last_departure": _hhmm(last),
+    })
+    k = m > 0
+    for p in HEADWAY_PCTS:
+        col = np.full(n_groups, np.nan)
+        rank = np.maximum(-(-p * m[k] // 100), 1) - 1     # nearest rank: ceil(p/100 * m) - 1
+        col[k] = gap[s[k] + rank]
+        out[f"headway_p{p}_min"] = pd.array(np.round(col / 60), dtype="Int16")
+    out["departures_by_hour"] = hist
+    return out
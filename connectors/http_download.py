@@ -0,0 +1,236 @@
+# connectors/http_download.py
+import os, json, random, hashlib, contextvars
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from connectors import deadline
+
+# Partial downloads live here so a crashed/killed job can resume them on the next run.
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join("data", "cache", "downloads"))
+PARALLEL_RANGES = int(os.getenv("DOWNLOAD_PARALLEL_RANGES", "1"))
+MIN_SEGMENT_BYTES = 8 * 1024 * 1024   # don't split files smaller than parallel * this
+BLOCK_BYTES = 1024 * 1024
+# upper bound per network read; read1 hands back whatever has arrived, so a drop loses nothing
+STREAM_BYTES = 64 * 1024
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+def _headers(headers):
+    # no transfer compression: Range offsets, sizes and the bytes on disk are the file's own
+    return {**(headers or {}), "Accept-Encoding": "identity"}
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter: sleep U(0, min(cap, base * 2^attempt))."""
+    deadline.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))))
+
+def _default_dest(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    name = os.path.basename(url.split("?")[0].rstrip("/")) or "download"
+    return os.path.join(DOWNLOAD_DIR, f"{key}_{name}")
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _load_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _save_meta(path, meta):
+    with open(path, "w") as f:
+        json.dump(meta, f)
+
+def _total_from_response(r, offset):
+    # Content-Range: bytes 100-199/1000  ->  1000
+    cr = r.headers.get("Content-Range", "")
+    if "/" in cr:
+        total = cr.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    cl = r.headers.get("Content-Length")
+    if cl and cl.isdigit():
+        return offset + int(cl) if r.status_code == 206 else int(cl)
+    return None
+
+def _probe(url, headers, timeout):
+    """HEAD the resource -> (size, accepts_ranges, validator). Any failure just disables parallel mode."""
+    try:
+        r = requests.head(url, headers=_headers(headers), timeout=deadline.timeout(timeout), allow_redirects=True)
+        if r.status_code != 200:
+            return None, False, None
+        cl = r.headers.get("Content-Length")
+        size = int(cl) if cl and cl.isdigit() else None
+        ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return size, ranges, r.headers.get("ETag") or r.headers.get("Last-Modified")
+    except Exception:
+        return None, False, None
+
+def _fetch_to_part(url, part, headers, timeout, tries, start=0, end=None, validator=None):
+    """
+    Fill `part` with bytes [start, end] of the resource (end=None -> to EOF), resuming from
+    whatever is already on disk. Only attempts that make no progress count against `tries`.
+    Returns the total resource size if the server told us, else None.
+    """
+    meta_path = part + ".meta"
+    meta = _load_meta(meta_path)
+    if validator and meta.get("validator") not in (None, validator):
+        # resource changed since the partial was written -> start over
+        open(part, "wb").close()
+    validator = validator or meta.get("validator")
+    want = None if end is None else end - start + 1
+    total = meta.get("total")
+    failures, err = 0, None
+
+    while failures < tries:
+        deadline.check(url)
+        have = _size(part)
+        if want is not None and have >= want:
+            return total
+        h = _headers(headers)
+        if have or start or end is not None:
+            h["Range"] = f"bytes={start + have}-{'' if end is None else end}"
+            if validator:
+                h["If-Range"] = validator
+        try:
+            with requests.get(url, headers=h, timeout=deadline.timeout(timeout), stream=True, allow_redirects=True) as r:
+                if r.status_code == 416 and have and end is None:
+                    return total or have   # already complete
+                if r.status_code == 200 and (have or start):
+                    if start:
+                        raise RuntimeError("server ignored Range on a parallel segment")
+                    have = 0   # full body (resource changed or no range support) -> rewrite
+                elif r.status_code not in (200, 206):
+                    raise RuntimeError(f"HTTP {r.status_code}")
+                total = _total_from_response(r, start + have) or total
+                validator = validator or r.headers.get("ETag") or r.headers.get("Last-Modified")
+                _save_meta(meta_path, {"validator": validator, "total": total})
+                with open(part, "ab" if have else "wb") as out:
+                    # raw bytes as sent (offsets must match the Range we asked for)
+                    while True:
+                        block = r.raw.read1(STREAM_BYTES, decode_content=False)
+                        if not block:
+                            break
+                        out.write(block)
+                        deadline.check(url)   # keeps what we have; the next run resumes it
+            got = _size(part)
+            if want is not None and got >= want:
+                return total
+            if want is None and (total is None or got >= total - start):
+                return total
+            err = f"connection dropped at {got} bytes"
+            failures = 0 if got > have else failures + 1
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            err = str(e)
+            failures = 0 if _size(part) > have else failures + 1
+        if failures < tries:
+            _backoff(failures)
+    raise RuntimeError(f"Download failed for {url}: {err}")
+
+def _verify(path, url, expected_size=None, sha256=None):
+    size = _size(path)
+    if expected_size is not None and size != expected_size:
+        os.remove(path)
+        raise RuntimeError(f"Download failed for {url}: size {size} != expected {expected_size}")
+    if sha256:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_BYTES), b""):
+                h.update(block)
+        if h.hexdigest().lower() != sha256.lower():
+            os.remove(path)
+            raise RuntimeError(f"Download failed for {url}: sha256 mismatch")
+
+def _not_modified(url, dest, headers, timeout):
+    """Conditional HEAD against the validator stored with a kept download; True on 304."""
+    validator = _load_meta(dest + ".meta").get("validator")
+    if not validator or not os.path.exists(dest):
+        return False
+    h = _headers(headers)
+    # ETags are quoted ("abc" / W/"abc"); anything else is a Last-Modified date
+    h["If-None-Match" if validator.startswith(('"', 'W/')) else "If-Modified-Since"] = validator
+    try:
+        r = requests.head(url, headers=h, timeout=deadline.timeout(timeout), allow_redirects=True)
+        return r.status_code == 304
+    except deadline.DeadlineExceeded:
+        raise
+    except Exception:
+        return False
+
+def _cleanup(*paths):
+    for p in paths:
+        for q in (p, p + ".meta"):
+            if os.path.exists(q):
+                os.remove(q)
+
+def download(url, dest=None, headers=None, tries=5, timeout=120,
+             expected_size=None, sha256=None, parallel=None, revalidate=False):
+    """
+    Resumable download of `url` to `dest` (default: under DOWNLOAD_DIR).
+    Writes to `<dest>.part` and resumes with Range requests after drops; retries back off
+    exponentially with jitter. With parallel > 1 and a server that advertises byte ranges,
+    the file is fetched as that many concurrent segments. With revalidate, an existing `dest`
+    is reused when a conditional HEAD on its stored ETag/Last-Modified returns 304.
+    Returns the final path.
+    """
+    dest = dest or _default_dest(url)
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    part = dest + ".part"
+    parallel = PARALLEL_RANGES if parallel is None else parallel
+
+    if revalidate and _not_modified(url, dest, headers, timeout):
+        print(f"  -> {url} not modified, reusing the kept download")
+        return dest
+
+    size, ranges, validator = (None, False, None)
+    if parallel > 1:
+        size, ranges, validator = _probe(url, headers, timeout)
+
+    if parallel > 1 and ranges and size and size >= parallel * MIN_SEGMENT_BYTES:
+        step = -(-size // parallel)
+        bounds = [(i, min(i + step, size) - 1) for i in range(0, size, step)]
+        parts = [f"{part}.{n}" for n in range(len(bounds))]
+        with ThreadPoolExecutor(max_workers=len(bounds)) as ex:
+            # each segment thread runs under a copy of our context so it sees the same deadline
+            futures = [
+                ex.submit(contextvars.copy_context().run,
+                          _fetch_to_part, url, p, headers, timeout, tries, s, e, validator)
+                for p, (s, e) in zip(parts, bounds)
+            ]
+            for f in futures:
+                f.result()
+        with open(part, "wb") as out:
+            for p in parts:
+                with open(p, "rb") as f:
+                    while True:
+                        block = f.read(BLOCK_BYTES)
+                        if not block:
+                            break
+                        out.write(block)
+        _cleanup(*parts)
+        expected_size = expected_size if expected_size is not None else size
+    else:
+        total = _fetch_to_part(url, part, headers, timeout, tries)
+        expected_size = expected_size if expected_size is not None else total
+        validator = _load_meta(part + ".meta").get("validator")
+
+    _cleanup(part + ".meta", dest)   # dest too: a kept copy's validator is stale now
+    os.replace(part, dest)
+    _verify(dest, url, expected_size, sha256)
+    if revalidate and validator:
+        _save_meta(dest + ".meta", {"validator": validator})
+    return dest
+
+def download_bytes(url, keep=False, **kwargs):
+    """
+    download() and return the content. The file is removed afterwards unless keep, in which
+    case it stays under DOWNLOAD_DIR and the next call only re-downloads it if it changed.
+    """
+    path = download(url, revalidate=keep, **kwargs)
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        if not keep:
+            _cleanup(path)
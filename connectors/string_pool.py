@@ -0,0 +1,126 @@
+# connectors/string_pool.py
+import numpy as np
+import pandas as pd
+
+# Name columns that repeat heavily across rows and connectors; interned into the run's pool
+STRING_COLUMNS = [
+    "transport_type", "operator_name",
+    "origin_city", "origin_country", "origin_station",
+    "destination_city", "destination_country", "destination_station",
+]
+
+class StringPool:
+    """
+    Append-only string -> int32 code dictionary shared by every connector in a run.
+    Interned columns are pandas Categoricals over the pool, so merge/dedup/groupby hash
+    codes instead of strings; the text itself is only produced when a writer calls to_csv.
+    Codes never change once assigned, so frames interned early stay valid as the pool grows.
+    """
+
+    def __init__(self):
+        self._strings = []
+        self._dtype = None
+
+    def __len__(self):
+        return len(self._strings)
+
+    @property
+    def dtype(self) -> pd.CategoricalDtype:
+        # one dtype object per pool size: building/validating it hashes every category
+        if self._dtype is None or len(self._dtype.categories) != len(self._strings):
+            self._dtype = pd.CategoricalDtype(pd.Index(self._strings, dtype=object))
+        return self._dtype
+
+    @property
+    def categories(self) -> pd.Index:
+        return self.dtype.categories
+
+    def encode(self, values) -> np.ndarray:
+        """Codes (int32, -1 for missing) for any array-like of strings; unseen strings are added."""
+        if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+            values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        # distinct values as text (1 and "1" are one name), looked up against the pool by hash
+        text_codes, text = pd.factorize(pd.Index(uniques, dtype=object).astype(str))
+        mapped = self.categories.get_indexer(text).astype(np.int32)
+        new = np.flatnonzero(mapped < 0)
+        if len(new):
+            mapped[new] = np.arange(len(self._strings), len(self._strings) + len(new))
+            self._strings.extend(text[new])
+        mapped = mapped[text_codes]
+        return np.where(codes >= 0, mapped[codes] if len(mapped) else -1, -1).astype(np.int32)
+
+    def categorical(self, codes) -> pd.Categorical:
+        return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int32), dtype=self.dtype, validate=False)
+
+    def codes(self, s: pd.Series) -> np.ndarray:
+        """Pool codes of a column, interning it first if it isn't already on this pool."""
+        if self.owns(s):
+            return s.cat.codes.to_numpy(dtype=np.int32)
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # encode the categories once, then take by code
+            cat_codes = self.encode(s.cat.categories)
+            raw = s.cat.codes.to_numpy()
+            return np.where(raw >= 0, cat_codes[raw] if len(cat_codes) else -1, -1).astype(np.int32)
+        return self.encode(s)
+
+    def owns(self, s: pd.Series) -> bool:
+        if not isinstance(s.dtype, pd.CategoricalDtype):
+            return False
+        if s.dtype is self.dtype:
+            return True
+        cats = s.cat.categories
+        return len(cats) <= len(self._strings) and cats.equals(self.categories[:len(cats)])
+
+    def intern(self, df: pd.DataFrame, columns=STRING_COLUMNS) -> pd.DataFrame:
+        """Copy of df with the given text columns as Categoricals on the pool."""
+        df = df.copy()
+        for c in columns:
+            if c in df.columns:
+                df[c] = self.categorical(self.codes(df[c]))
+        return df
+
+    def map(self, s: pd.Series, fn) -> pd.Series:
+        """Apply fn to each distinct value of s (missing stays missing); returns a pooled column."""
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        mapped = self.encode([fn(u) for u in uniques])
+        return pd.Series(self.categorical(np.where(codes >= 0, mapped[codes] if len(mapped) else -1, -1)),
+                         index=s.index, name=s.name)
+
+    def align(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Re-wrap pooled columns with the full current category list (codes are unchanged)."""
+        df = df.copy()
+        for c in df.columns:
+            if df[c].dtype is not self.dtype and self.owns(df[c]):
+                df[c] = self.categorical(df[c].cat.codes)
+        return df
+
+    def concat(self, frames) -> pd.DataFrame:
+        # identical categories on every frame -> pd.concat keeps the columns categorical
+        return pd.concat([self.align(f) for f in frames], ignore_index=True)
+
+def as_text(s: pd.Series):
+    """
+    Column as text with missing -> "" for hashing. A categorical stays categorical (pandas
+    hashes each category once and takes by code, which equals hashing the text itself).
+    """
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(object).fillna("").astype(str)
+    cats = s.cat.categories.astype(str)
+    if "" in cats:
+        empty = cats.get_loc("")
+    else:
+        cats, empty = cats.append(pd.Index([""])), len(cats)
+    codes = s.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codes >= 0, codes, empty), categories=cats)
+
+def sort_key(s: pd.Series) -> pd.Series:
+    """sort_values(key=...) helper: pooled/categorical columns sort by text, not by code."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    rank = np.argsort(np.argsort(s.cat.categories.astype(str).to_numpy(), kind="stable"), kind="stable")
+    codes = s.cat.codes.to_numpy()
+    return pd.Series(np.where(codes >= 0, rank[codes] if len(rank) else 0, -1), index=s.index).where(codes >= 0)
+
+# the run's shared pool (one build_monthly process = one run)
+POOL = StringPool()
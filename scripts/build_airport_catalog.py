@@ -0,0 +1,56 @@
+# scripts/build_airport_catalog.py
+"""
+Regenerate data/reference/airports.csv (the AeroDataBox crawl list) from the
+`airportsdata` package (MIT, https://github.com/mborsetti/airportsdata):
+
+    pip install airportsdata
+    python -m scripts.build_airport_catalog
+
+Only airports with an IATA code are kept. Tiers decide crawl order:
+  1 = major hubs (HUBS below) and airports of IATA multi-airport cities
+  2 = other airports named "International"
+  3 = everything else
+"""
+import os
+import pandas as pd
+
+OUT_PATH = os.path.join("data", "reference", "airports.csv")
+
+# Busiest passenger airports / main hubs per region
+HUBS = [
+    # Europe
+    "LHR", "LGW", "STN", "MAN", "EDI", "CDG", "ORY", "NCE", "LYS", "FRA", "MUC", "BER", "DUS", "HAM",
+    "AMS", "BRU", "MAD", "BCN", "PMI", "AGP", "LIS", "OPO", "DUB", "MXP", "FCO", "VCE", "NAP", "ZRH",
+    "GVA", "VIE", "CPH", "ARN", "OSL", "HEL", "WAW", "PRG", "BUD", "ATH", "IST", "SAW", "OTP", "KEF",
+    # North America
+    "JFK", "EWR", "LGA", "BOS", "IAD", "PHL", "ATL", "MIA", "MCO", "CLT", "ORD", "DFW", "IAH", "DEN",
+    "PHX", "LAS", "LAX", "SFO", "SEA", "MSP", "DTW", "YYZ", "YUL", "YVR", "YYC", "MEX", "CUN",
+    # Latin America
+    "GRU", "GIG", "BOG", "LIM", "SCL", "EZE", "PTY",
+    # Middle East / Africa
+    "DXB", "DOH", "AUH", "RUH", "JED", "TLV", "CAI", "JNB", "CPT", "ADD", "NBO", "LOS", "CMN",
+    # Asia / Pacific
+    "DEL", "BOM", "BLR", "SIN", "KUL", "BKK", "CGK", "MNL", "HKG", "TPE", "ICN", "NRT", "HND", "KIX",
+    "PEK", "PKX", "PVG", "CAN", "SZX", "CTU", "SYD", "MEL", "BNE", "AKL",
+]
+
+def main():
+    import airportsdata
+    base = os.path.dirname(airportsdata.__file__)
+    ap = pd.read_csv(os.path.join(base, "airports.csv"), keep_default_na=False)
+    macs = pd.read_csv(os.path.join(base, "iata_macs.csv"), keep_default_na=False)
+
+    ap = ap[ap["iata"].str.len() == 3].drop_duplicates("iata")
+    tier = pd.Series(3, index=ap.index)
+    tier[ap["name"].str.contains("International", case=False)] = 2
+    tier[ap["iata"].isin(HUBS) | ap["iata"].isin(macs["Airport Code"])] = 1
+    ap["tier"] = tier
+
+    out = ap[["iata", "icao", "name", "city", "country", "lat", "lon", "tier"]]
+    out = out.sort_values(["tier", "iata"])
+    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
+    out.to_csv(OUT_PATH, index=False)
+    print(f"Wrote {len(out)} airports to {OUT_PATH}: {out['tier'].value_counts().sort_index().to_dict()}")
+
+if __name__ == "__main__":
+    main()
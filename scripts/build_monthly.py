@@ -1,5 +1,5 @@
 # scripts/build_monthly.py
-import os
+import os, time
 import pandas as pd
 
 # --- Connectors ---
@@ -9,49 +9,42 @@ from connectors import (
     bus_irishcitylink,
     air_aerodatabox
 )
+from connectors.string_pool import POOL
+from scripts import validate_routes, route_delta, shard_output, geometry, station_index, reconcile_cities, route_cubes, connector_runner
 
 os.makedirs("data/outputs", exist_ok=True)
 
-def main(out_dir="data/outputs"):
-    print("🌍 Building combined global transport dataset...")
+# "csv" = single world_bus.csv, "shards" = per mode/country compressed shards, "both"
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "csv")
+SHARD_COMPRESSION = os.getenv("SHARD_COMPRESSION", "gzip")  # or "zstd"
 
-    frames = []
+# (name for budgets/status, label, fetch, its rows in the published output) in run order
+CONNECTORS = [
+    ("flixbus", "FlixBus", bus_flixbus.fetch_routes, {"operator_name": ["FlixBus/EU", "FlixBus/US"]}),
+    ("nationalexpress", "National Express", bus_nationalexpress.fetch_routes,
+     {"operator_name": [bus_nationalexpress.OPERATOR_NAME]}),
+    ("irishcitylink", "Irish Citylink", bus_irishcitylink.fetch_routes,
+     {"operator_name": [bus_irishcitylink.OPERATOR_NAME]}),
+    ("aerodatabox", "AeroDataBox", air_aerodatabox.fetch_routes, {"transport_type": ["air"]}),
+]
 
-    # --- 1. FlixBus ---
-    print("\n▶ Fetching FlixBus routes…")
-    try:
-        df_flix = bus_flixbus.fetch_routes()
-        print(f"✅ FlixBus: {len(df_flix)} rows")
-        frames.append(df_flix)
-    except Exception as e:
-        print(f"❌ FlixBus failed: {e}")
-
-    # --- 2. National Express ---
-    print("\n▶ Fetching National Express routes…")
-    try:
-        df_ne = bus_nationalexpress.fetch_routes()
-        print(f"✅ National Express: {len(df_ne)} rows")
-        frames.append(df_ne)
-    except Exception as e:
-        print(f"❌ National Express failed: {e}")
+def main(out_dir="data/outputs"):
+    print("🌍 Building combined global transport dataset...")
 
-    # --- 3. Irish Citylink ---
-    print("\n▶ Fetching Irish Citylink routes…")
-    try:
-        df_citylink = bus_irishcitylink.fetch_routes()
-        print(f"✅ Irish Citylink: {len(df_citylink)} rows")
-        frames.append(df_citylink)
-    except Exception as e:
-        print(f"❌ Irish Citylink failed: {e}")
+    frames, statuses = [], []
+    build_deadline = time.monotonic() + connector_runner.BUILD_BUDGET_S if connector_runner.BUILD_BUDGET_S else None
 
-    # --- 4. AeroDataBox (Air routes) ---
-    print("\n✈️ Fetching AeroDataBox air routes…")
-    try:
-        df_air = air_aerodatabox.fetch_routes()
-        print(f"✅ AeroDataBox: {len(df_air)} rows")
-        frames.append(df_air)
-    except Exception as e:
-        print(f"❌ AeroDataBox failed: {e}")
+    # --- 1-4. Live connectors, each under its own time budget ---
+    # a failed connector falls back to its rows in the previous run's output (read before it is replaced)
+    published = connector_runner.LastPublished(out_dir)
+    for name, label, fetch, rows_of in CONNECTORS:
+        print(f"\n▶ Fetching {label} routes…")
+        df_src, status = connector_runner.run(name, label, fetch, build_deadline,
+                                              last_good=lambda rows_of=rows_of: published.rows(rows_of))
+        statuses.append(status)
+        if df_src is not None:
+            frames.append(df_src)
+    connector_runner.write_status(statuses, out_dir)
 
     # --- 5. Vendor static datasets (Megabus, ALSA, etc.) ---
     print("\n▶ Including vendor datasets…")
@@ -63,7 +56,7 @@ def main(out_dir="data/outputs"):
                 print(f"   → Added vendor dataset: {f}")
                 try:
                     vdf = pd.read_csv(path)
-                    frames.append(vdf)
+                    frames.append(POOL.intern(vdf))
                 except Exception as e:
                     print(f"   ⚠️ Failed to load {f}: {e}")
     else:
@@ -71,16 +64,37 @@ def main(out_dir="data/outputs"):
 
     # --- Combine all ---
     if frames:
-        df_all = pd.concat(frames, ignore_index=True)
-        print(f"\n✅ Total combined routes: {len(df_all)}")
+        # name columns stay int32 codes on the shared pool until the writers below
+        df_all = POOL.concat(frames)
+        print(f"\n✅ Total combined routes: {len(df_all)} ({len(POOL):,} distinct names)")
+        df_all = reconcile_cities.reconcile(df_all)
+        df_all = geometry.add_geometry(df_all)
+        print("\n▶ Validating combined routes…")
+        df_all = validate_routes.validate(df_all, out_dir)
+        df_all = station_index.assign_station_ids(df_all)
     else:
         print("⚠️ No data to combine.")
         df_all = pd.DataFrame()
 
     # --- Save ---
-    out_path = os.path.join(out_dir, "world_bus.csv")
-    df_all.to_csv(out_path, index=False)
-    print(f"\n💾 Saved combined dataset to {out_path}")
+    if OUTPUT_MODE in ("csv", "both"):
+        out_path = os.path.join(out_dir, "world_bus.csv")
+        df_all.to_csv(out_path, index=False)
+        print(f"\n💾 Saved combined dataset to {out_path}")
+    if OUTPUT_MODE in ("shards", "both") and not df_all.empty:
+        shard_output.write_shards(df_all, out_dir, compression=SHARD_COMPRESSION)
+
+    # --- Station table + spatial index ---
+    if not df_all.empty:
+        station_index.write_index(df_all, out_dir, routes="shards" if OUTPUT_MODE in ("shards", "both") else "csv")
+
+    # --- Pre-aggregated cubes for dashboards ---
+    if not df_all.empty:
+        route_cubes.write_cubes(df_all, out_dir)
+
+    # --- Delta vs previous run ---
+    if not df_all.empty:
+        route_delta.write_delta(df_all, out_dir)
 
 
 if __name__ == "__main__":
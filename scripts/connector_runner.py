@@ -0,0 +1,122 @@
+# scripts/connector_runner.py
+import os, time, threading
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from connectors import deadline
+from connectors.string_pool import POOL
+from scripts import shard_output
+from scripts.station_index import ROUTES_FILE
+
+# Wall-clock budget per connector (seconds); override one with e.g. FLIXBUS_BUDGET_S=600.
+DEFAULT_BUDGET_S = float(os.getenv("CONNECTOR_BUDGET_S", "1200"))
+# Optional cap on all connectors together (0 = none); later connectors get what is left.
+BUILD_BUDGET_S = float(os.getenv("BUILD_BUDGET_S", "0"))
+# How long past its budget we wait for a connector to reach a cancellation point
+GRACE_S = 30
+
+STATUS_FILE = "source_status.csv"
+# added by the build after the connectors; dropped from reused rows so they are recomputed
+DERIVED_COLUMNS = ["distance_km", "avg_speed_kmh", "origin_station_id", "destination_station_id"]
+
+def budget_for(name, build_deadline=None):
+    b = float(os.getenv(f"{name.upper()}_BUDGET_S", DEFAULT_BUDGET_S))
+    if build_deadline is not None:
+        b = min(b, max(0.0, build_deadline - time.monotonic()))
+    return b
+
+class LastPublished:
+    """
+    The previous run's published route table in out_dir (shards, else world_bus.csv), read
+    once on first use. A connector without fresh output falls back to its rows there, so no
+    separate per-connector snapshot has to be kept (or committed).
+    """
+
+    def __init__(self, out_dir="data/outputs"):
+        self.out_dir = out_dir
+        self._df = None
+
+    def _load(self):
+        if self._df is None:
+            manifest = os.path.join(self.out_dir, shard_output.SHARD_DIR, shard_output.MANIFEST)
+            csv = os.path.join(self.out_dir, ROUTES_FILE)
+            # the hour histogram is fixed-width text; all-digit values must not become ints
+            if os.path.exists(manifest):
+                df = shard_output.read_shards(self.out_dir, dtype={"departures_by_hour": str})
+            elif os.path.exists(csv):
+                df = pd.read_csv(csv, dtype={"departures_by_hour": str})
+            else:
+                df = pd.DataFrame()
+            self._df = df.drop(columns=DERIVED_COLUMNS, errors="ignore")
+        return self._df
+
+    def rows(self, match):
+        """Rows whose columns take one of the listed values, e.g. {"operator_name": ["ALSA"]}; None if none."""
+        df = self._load()
+        if not match or df.empty or any(c not in df.columns for c in match):
+            return None
+        keep = np.logical_and.reduce([df[c].isin(v).to_numpy() for c, v in match.items()])
+        return df[keep].reset_index(drop=True) if keep.any() else None
+
+def _call(fetch, seconds, box):
+    try:
+        with deadline.budget(seconds):
+            box["df"] = fetch()
+    except Exception as e:
+        box["error"] = e
+
+def run(name, label, fetch, build_deadline=None, last_good=None):
+    """
+    Run one connector's fetch() on a worker thread under its wall-clock budget.
+    The connector stops itself at its next deadline.check(); if it hasn't returned GRACE_S
+    after the budget, the thread is abandoned. On timeout, error or an empty result the
+    connector's rows from the last published output are used instead (last_good() -> df or
+    None). Returns (df or None, status dict), with the name columns interned into the run's
+    string pool.
+
+    Cancellation is cooperative: Python threads can't be killed, so code between two checks
+    (one large pandas call, a per-row apply not wrapped in deadline.in_chunks) runs to the end.
+    An abandoned thread keeps its memory and competes for the GIL with the connectors after it
+    until it reaches a check, so long CPU loops in connectors should check at least every few
+    seconds.
+    """
+    seconds = budget_for(name, build_deadline)
+    started = time.monotonic()
+    box = {}
+    if seconds > 0:
+        worker = threading.Thread(target=_call, args=(fetch, seconds, box), name=f"connector-{name}", daemon=True)
+        worker.start()
+        worker.join(seconds + GRACE_S)
+        if worker.is_alive():
+            box["error"] = deadline.DeadlineExceeded(f"{label}: no response {GRACE_S}s past its budget")
+    else:
+        box["error"] = deadline.DeadlineExceeded(f"{label}: build budget already spent")
+    elapsed = round(time.monotonic() - started, 1)
+
+    df, err = box.get("df"), box.get("error")
+    if err is None and (df is None or df.empty):
+        err = RuntimeError("returned no rows")
+    status = {"source": name, "budget_s": seconds, "elapsed_s": elapsed, "error": "" if err is None else str(err)}
+
+    if err is None:
+        print(f"✅ {label}: {len(df)} rows ({elapsed}s)")
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        return POOL.intern(df), {**status, "status": "fresh", "rows": len(df), "data_as_of": fetched_at}
+
+    timed_out = isinstance(err, deadline.DeadlineExceeded)
+    print(f"{'⏱️' if timed_out else '❌'} {label} failed after {elapsed}s: {err}")
+    snap = last_good() if last_good is not None else None
+    if snap is None:
+        return None, {**status, "status": "missing", "rows": 0, "data_as_of": ""}
+    print(f"   ↩ using {label}'s rows from the last published output ({len(snap)} rows)")
+    # when those rows were fetched is not recorded anywhere, so data_as_of stays empty
+    return POOL.intern(snap), {**status, "status": "stale", "rows": len(snap), "data_as_of": ""}
+
+def write_status(statuses, out_dir="data/outputs"):
+    cols = ["source", "status", "rows", "data_as_of", "elapsed_s", "budget_s", "error"]
+    report = pd.DataFrame(statuses, columns=cols)
+    report.to_csv(os.path.join(out_dir, STATUS_FILE), index=False)
+    stale = report.loc[report["status"] != "fresh", "source"].tolist()
+    if stale:
+        print(f"⚠️ Stale or missing sources: {', '.join(stale)}")
+    return report
@@ -0,0 +1,37 @@
+# scripts/geometry.py
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+COORD_COLS = ["origin_lat", "origin_lon", "dest_lat", "dest_lon"]
+
+def _arr(x):
+    return np.asarray(pd.to_numeric(x, errors="coerce"), dtype=np.float64)
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance over whole arrays (NaN where any coordinate is missing)."""
+    lat1, lon1, lat2, lon2 = (np.radians(_arr(x)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def duration_minutes(s: pd.Series) -> pd.Series:
+    # "HH:MM" -> minutes, vectorized; anything unparsable -> NaN
+    parts = s.astype(str).str.extract(r"^\s*(\d{1,3}):(\d{2})")
+    return pd.to_numeric(parts[0], errors="coerce") * 60 + pd.to_numeric(parts[1], errors="coerce")
+
+def add_geometry(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make sure the coordinate columns exist (float32, NaN for sources without them) and add
+    distance_km and avg_speed_kmh (distance / scheduled duration), computed over whole columns.
+    """
+    df = df.copy()
+    for c in COORD_COLS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32") if c in df.columns else np.float32(np.nan)
+    km = haversine_km(df["origin_lat"], df["origin_lon"], df["dest_lat"], df["dest_lon"])
+    hours = duration_minutes(df["duration"]).to_numpy(dtype=np.float64) / 60.0 if "duration" in df.columns \
+        else np.full(len(df), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(hours > 0, km / hours, np.nan)
+    df["distance_km"] = np.round(km, 1).astype("float32")
+    df["avg_speed_kmh"] = np.round(speed, 1).astype("float32")
+    return df
@@ -0,0 +1,242 @@
+# scripts/reconcile_cities.py
+import os, re, difflib, unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from connectors.string_pool import POOL
+from scripts.geometry import haversine_km
+
+# Accepted raw name -> canonical name mappings. Bump the version whenever _norm_city or the
+# scoring changes, so old decisions are not reused under new rules.
+MAPPING_VERSION = 3
+MAPPING_PATH = os.path.join("data", "reference", f"city_mappings_v{MAPPING_VERSION}.csv")
+
+MIN_RATIO = 0.85      # difflib ratio of the normalized head words
+MIN_TRIGRAM = 0.5     # Jaccard of character trigrams (keeps Hamburg/Homburg apart)
+PARALLEL_MIN_BLOCKS = 200
+# two spellings only merge when their stations are this close (Richmond CA vs Richmond VA)
+MERGE_RADIUS_KM = float(os.getenv("CITY_MERGE_RADIUS_KM", "50"))
+
+# English / native / code spellings -> ISO 3166 alpha-2 (keys are _fold()ed)
+COUNTRY_ALIASES = {
+    "ES": ["es", "spain", "espana"], "FR": ["fr", "france"],
+    "IT": ["it", "italy", "italia"], "DE": ["de", "germany", "deutschland"],
+    "CH": ["ch", "switzerland", "schweiz", "suisse", "svizzera"],
+    "AT": ["at", "austria", "osterreich"], "BE": ["be", "belgium", "belgie", "belgique"],
+    "NL": ["nl", "netherlands", "the netherlands", "nederland", "holland"],
+    "GB": ["gb", "uk", "united kingdom", "great britain", "england", "scotland", "wales"],
+    "IE": ["ie", "ireland", "eire"], "PT": ["pt", "portugal"],
+    "PL": ["pl", "poland", "polska"], "CZ": ["cz", "czechia", "czech republic", "cesko"],
+    "SK": ["sk", "slovakia", "slovensko"], "SI": ["si", "slovenia", "slovenija"],
+    "HU": ["hu", "hungary", "magyarorszag"], "HR": ["hr", "croatia", "hrvatska"],
+    "SE": ["se", "sweden", "sverige"], "NO": ["no", "norway", "norge"],
+    "DK": ["dk", "denmark", "danmark"], "FI": ["fi", "finland", "suomi"],
+    "LU": ["lu", "luxembourg"], "RO": ["ro", "romania"], "BG": ["bg", "bulgaria"],
+    "RS": ["rs", "serbia", "srbija"], "GR": ["gr", "greece", "hellas"],
+    "US": ["us", "usa", "united states", "united states of america"],
+    "CA": ["ca", "canada"], "MX": ["mx", "mexico"],
+}
+
+# words _extract_city leaves behind that don't distinguish places
+NOISE = r"\b(central|centre|center|station|stazione|estacion|gare|bus|coach|terminal|hbf|zob|airport)\b"
+
+def _fold(s) -> str:
+    s = unicodedata.normalize("NFKD", str(s))
+    return "".join(ch for ch in s if not unicodedata.combining(ch)).lower().strip()
+
+_COUNTRY = {alias: code for code, names in COUNTRY_ALIASES.items() for alias in names}
+
+def canonical_country(s: pd.Series) -> pd.Series:
+    # evaluated once per distinct spelling; the result is a pooled column
+    return POOL.map(s, lambda x: _COUNTRY.get(_fold(x), x))
+
+def _map_pairs(country: pd.Series, city: pd.Series, fn) -> pd.Series:
+    """fn(country, city) once per distinct pair, scattered back by group code (missing city stays missing)."""
+    g = pd.DataFrame({"co": country, "ci": city}).groupby(["co", "ci"], observed=True, dropna=False, sort=False).ngroup()
+    g = g.to_numpy()
+    _, first = np.unique(g, return_index=True)
+    values = [fn(str(co), ci) if pd.notna(ci) else None
+              for co, ci in zip(country.iloc[first], city.iloc[first])]
+    return pd.Series(POOL.categorical(POOL.encode(values)[g]), index=city.index, name=city.name)
+
+def _norm_city(name) -> str:
+    s = _fold(name)
+    s = re.sub(r"\([^)]*\)?", " ", s)           # "(im Breisgau)", unbalanced "(..."
+    s = re.sub(NOISE, " ", s).replace("'", "")
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+def _display_city(name) -> str:
+    # same cleanup as _norm_city, but keeps case and accents; a raw name equal to this is "clean"
+    s = re.sub(r"\([^)]*\)?", " ", str(name))
+    s = re.sub(NOISE, " ", s, flags=re.IGNORECASE)
+    s = re.sub(r"\s+", " ", s).strip(" -,/")
+    return s or str(name).strip()
+
+def _soundex(word: str) -> str:
+    codes = {**dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+             "l": "4", **dict.fromkeys("mn", "5"), "r": "6"}
+    if not word:
+        return ""
+    out, last = word[0], codes.get(word[0], "")
+    for ch in word[1:]:
+        c = codes.get(ch, "")
+        if c and c != last:
+            out += c
+        if ch not in "hw":
+            last = c
+    return (out + "000")[:4]
+
+def _trigrams(s: str) -> set:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _block_keys(norm: str):
+    first = norm.split(" ")[0] if norm else ""
+    return (f"sx:{_soundex(first)}", f"tg:{norm[:3]}")
+
+def _score_block(names):
+    """
+    All accepted (a, b, score) pairs among the normalized names of one block. Only the head
+    word may differ fuzzily (Sevilla/Seville, Francfort/Frankfurt); any further words must
+    match exactly, so "Stand A"/"Stand B" or "Westside"/"Eastside" stay apart (and so do
+    "Francfort"/"Frankfurt am Main").
+    """
+    out = []
+    grams = {n: _trigrams(n) for n in names}
+    for i, a in enumerate(names):
+        head_a, _, rest_a = a.partition(" ")
+        for b in names[i + 1:]:
+            head_b, _, rest_b = b.partition(" ")
+            if rest_a != rest_b:
+                continue
+            ga, gb = grams[a], grams[b]
+            jac = len(ga & gb) / len(ga | gb)
+            if jac < MIN_TRIGRAM:
+                continue
+            ratio = difflib.SequenceMatcher(None, head_a, head_b).ratio()
+            if ratio >= MIN_RATIO:
+                out.append((a, b, round(ratio, 3)))
+    return out
+
+def _load_mappings(path=MAPPING_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["country", "raw_name", "canonical_name", "score", "method"])
+    return pd.read_csv(path, keep_default_na=False)
+
+def reconcile(df: pd.DataFrame, mapping_path=MAPPING_PATH) -> pd.DataFrame:
+    """
+    Canonicalize countries (ISO alpha-2 where known) and city names. Names already in the
+    mapping file are a dictionary lookup; only new names are normalized, blocked by
+    country + soundex / 3-letter prefix, and fuzzily scored within their blocks (blocks are
+    spread over processes when there are many). Matching names only merge when the median
+    coordinates of their stations are within MERGE_RADIUS_KM. New decisions are appended
+    to the file.
+    """
+    df = df.copy()
+    for c in ("origin_country", "destination_country"):
+        if c in df.columns:
+            df[c] = canonical_country(df[c])
+
+    ends = [("origin_city", "origin_country"), ("destination_city", "destination_country")]
+    ends = [(ci, co) for ci, co in ends if ci in df.columns and co in df.columns]
+    if not ends:
+        return df
+    coords = {"origin_city": ("origin_lat", "origin_lon"), "destination_city": ("dest_lat", "dest_lon")}
+    names = pd.concat([pd.DataFrame({
+        "city": df[ci], "country": df[co],
+        **{k: pd.to_numeric(df[c], errors="coerce") if c in df.columns else np.nan
+           for k, c in zip(("lat", "lon"), coords[ci])},
+    }) for ci, co in ends])
+    # count (and locate) per distinct (city, country) first, then turn only those into text
+    counts = names.groupby(["city", "country"], observed=True).agg(
+        n=("city", "size"), lat=("lat", "median"), lon=("lon", "median")).reset_index()
+    counts = counts.astype({"city": str, "country": str}).sort_values("n", ascending=False, kind="stable")
+
+    known = _load_mappings(mapping_path)
+    seen = set(zip(known["country"], known["raw_name"]))
+    new = counts[[(co, ci) not in seen for ci, co in zip(counts["city"], counts["country"])]]
+
+    if len(new):
+        # normalized form + route count for every name in the affected countries
+        pool = counts[counts["country"].isin(new["country"])].copy()
+        norm = pool["city"].map(_norm_city)
+        # names that normalize to nothing only match themselves
+        pool["norm"] = norm.where(norm != "", "\0" + pool["city"])
+
+        # 1) exact match after normalization; 2) fuzzy match between normalized forms in a block
+        norms = pool.drop_duplicates(["country", "norm"])
+        blocks = {}
+        for co, nm in zip(norms["country"], norms["norm"]):
+            if not nm.startswith("\0"):
+                for k in _block_keys(nm):
+                    blocks.setdefault((co, k), []).append(nm)
+        work = [(co, sorted(v)) for (co, _), v in blocks.items() if len(v) > 1]
+        if len(work) >= PARALLEL_MIN_BLOCKS:
+            with ProcessPoolExecutor() as ex:
+                results = list(ex.map(_score_block, [names_ for _, names_ in work], chunksize=64))
+        else:
+            results = [_score_block(names_) for _, names_ in work]
+        pairs = [(co, a, b, s) for (co, _), res in zip(work, results) for a, b, s in res]
+
+        # candidate links between raw names: same normalized form, or an accepted fuzzy pair
+        # of forms; a link farther apart than MERGE_RADIUS_KM is two places sharing a name
+        # (names without coordinates keep the name-only decision)
+        members = pool.groupby(["country", "norm"], sort=False)["city"].agg(list).to_dict()
+        links = [(co, x, y, None) for (co, _), raws in members.items()
+                 for i, x in enumerate(raws) for y in raws[i + 1:]]
+        links += [(co, x, y, s) for co, a, b, s in pairs for x in members[(co, a)] for y in members[(co, b)]]
+        where = {(co, ci): (la, lo) for co, ci, la, lo in zip(pool["country"], pool["city"], pool["lat"], pool["lon"])}
+        ends_xy = np.array([where[(co, x)] + where[(co, y)] for co, x, y, _ in links], dtype=np.float64).reshape(-1, 4)
+        far = haversine_km(*ends_xy.T) > MERGE_RADIUS_KM
+
+        # union-find over the kept links; the most-served spelling becomes canonical
+        parent = {}
+        def find(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+        best = {}
+        for (co, x, y, s), too_far in zip(links, far):
+            if too_far:
+                continue
+            rx, ry = find((co, x)), find((co, y))
+            if rx != ry:
+                parent[rx] = ry
+            if s is not None:
+                best[(co, x)] = max(best.get((co, x), 0), s)
+                best[(co, y)] = max(best.get((co, y), 0), s)
+        pool["root"] = [find((co, ci)) for co, ci in zip(pool["country"], pool["city"])]
+        pool["len"] = pool["city"].str.len()
+        # a cluster that already has a cached spelling keeps it, so earlier decisions stay stable
+        cached = {(co, raw): can for co, raw, can in zip(known["country"], known["raw_name"], known["canonical_name"])}
+        pool["prior"] = [cached.get((co, ci)) for co, ci in zip(pool["country"], pool["city"])]
+        # a cluster prefers a member spelled without station words/brackets ("Frankfurt" over
+        # "Frankfurt Hbf"); if it has none, the shared cleaned form ("Prague (Zličín)" and
+        # "Prague (Florenc)" -> "Prague")
+        display = pool["city"].map(_display_city)
+        pool["clean"] = display == pool["city"]
+        pool["candidate"] = pool["prior"].fillna(pool["city"].where(pool["clean"], display))
+        canon = (pool.sort_values(["prior", "clean", "n", "len"], ascending=[True, False, False, True],
+                                  na_position="last")
+                     .drop_duplicates("root").set_index("root")["candidate"])
+        # a name that merged with nothing is published exactly as it came in
+        merged = pool["root"].map(pool["root"].value_counts()) > 1
+        pool["canonical_name"] = pool["root"].map(canon).where(merged, pool["city"])
+        pool["score"] = [best.get((co, ci), 1.0) for co, ci in zip(pool["country"], pool["city"])]
+        pool["method"] = ["same" if c == r else ("fuzzy" if (co, r) in best else "normalized")
+                          for c, r, co in zip(pool["canonical_name"], pool["city"], pool["country"])]
+
+        fresh = pool.merge(new[["city", "country"]], on=["city", "country"])
+        fresh = fresh.rename(columns={"city": "raw_name"})[["country", "raw_name", "canonical_name", "score", "method"]]
+        known = pd.concat([known, fresh], ignore_index=True)
+        os.makedirs(os.path.dirname(mapping_path) or ".", exist_ok=True)
+        known.sort_values(["country", "raw_name"]).to_csv(mapping_path, index=False)
+        print(f"🏙️  City reconciliation: {len(fresh):,} new names, "
+              f"{int((fresh['raw_name'] != fresh['canonical_name']).sum()):,} remapped")
+
+    lookup = {(co, raw): can for co, raw, can in zip(known["country"], known["raw_name"], known["canonical_name"])}
+    for ci, co in ends:
+        df[ci] = _map_pairs(df[co], df[ci], lambda co_, raw: lookup.get((co_, str(raw)), raw))
+    return df
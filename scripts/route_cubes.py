@@ -0,0 +1,104 @@
+# scripts/route_cubes.py
+import os
+import numpy as np
+import pandas as pd
+from scripts.geometry import duration_minutes
+
+try:
+    import pyarrow  # optional: pip install pyarrow (Parquet); falls back to csv.gz
+except ImportError:
+    pyarrow = None
+
+CUBE_DIR = "cubes"
+
+# finest grain, built from the route table; the roll-ups are re-aggregated from it
+BASE = ("operator_country_pair", ["transport_type", "operator_name", "origin_country", "destination_country"])
+ROLLUPS = {
+    "country_pair": ["transport_type", "origin_country", "destination_country"],
+    "operator": ["transport_type", "operator_name"],
+    "mode": ["transport_type"],
+}
+# not derivable from BASE, so aggregated from the route table as well
+CITY = ("city", ["transport_type", "origin_country", "origin_city"])
+
+# additive measures; mean_duration_min is derived from the sums at every level.
+# frequency_* sums frequency_daily (departures per day); trips_* sums trip_count, the number of
+# trips in the whole feed (FlixBus), which is not a daily figure and so is kept apart.
+MEASURES = ["routes", "duration_sum_min", "duration_n", "frequency_total", "frequency_n", "trips_total", "trips_n"]
+
+def _numeric(df, col) -> pd.Series:
+    return pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+
+def _measures(df: pd.DataFrame) -> pd.DataFrame:
+    mins = duration_minutes(df["duration"]) if "duration" in df.columns else pd.Series(np.nan, index=df.index)
+    freq = _numeric(df, "frequency_daily")
+    trips = _numeric(df, "trip_count")
+    return pd.DataFrame({
+        "routes": 1,
+        "duration_sum_min": mins.fillna(0),
+        "duration_n": mins.notna().astype("int64"),
+        "frequency_total": freq.fillna(0),
+        "frequency_n": freq.notna().astype("int64"),
+        "trips_total": trips.fillna(0),
+        "trips_n": trips.notna().astype("int64"),
+    }, index=df.index)
+
+def _aggregate(facts: pd.DataFrame, dims) -> pd.DataFrame:
+    cube = facts.groupby(dims, observed=True, sort=True)[MEASURES].sum().reset_index()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cube["mean_duration_min"] = (cube["duration_sum_min"] / cube["duration_n"]).round(1).astype("float32")
+    cube["routes"] = cube["routes"].astype("int32")
+    cube["duration_n"] = cube["duration_n"].astype("int32")
+    cube["frequency_n"] = cube["frequency_n"].astype("int32")
+    cube["duration_sum_min"] = cube["duration_sum_min"].astype("float64")
+    cube["frequency_total"] = cube["frequency_total"].astype("float32")
+    cube["trips_n"] = cube["trips_n"].astype("int32")
+    cube["trips_total"] = cube["trips_total"].astype("float32")
+    for d in dims:
+        cube[d] = cube[d].astype("category")
+    return cube
+
+def build_cubes(df: pd.DataFrame) -> dict:
+    """name -> aggregated frame (dimension columns as categoricals + MEASURES + mean_duration_min)."""
+    dims = sorted(set(BASE[1]) | set(CITY[1]))
+    keys = df.reindex(columns=dims).astype(object)
+    # rows without a mode are bus routes (FlixBus has no transport_type), as in validation/shards
+    keys["transport_type"] = keys["transport_type"].fillna("bus")
+    facts = pd.concat([keys.fillna("unknown").astype("category"), _measures(df)], axis=1)
+    base = _aggregate(facts, BASE[1])
+    cubes = {BASE[0]: base}
+    for name, level in ROLLUPS.items():
+        cubes[name] = _aggregate(base, level)
+    cubes[CITY[0]] = _aggregate(facts, CITY[1])
+    return cubes
+
+def write_cubes(df: pd.DataFrame, out_dir="data/outputs") -> dict:
+    """Materialize the cubes under <out_dir>/cubes/ (Parquet when pyarrow is available)."""
+    cube_dir = os.path.join(out_dir, CUBE_DIR)
+    os.makedirs(cube_dir, exist_ok=True)
+    cubes = build_cubes(df)
+    for name, cube in cubes.items():
+        if pyarrow is not None:
+            cube.to_parquet(os.path.join(cube_dir, f"{name}.parquet"), index=False, compression="zstd")
+        else:
+            cube.to_csv(os.path.join(cube_dir, f"{name}.csv.gz"), index=False,
+                        compression={"method": "gzip", "mtime": 0})
+    if pyarrow is None:
+        print("⚠️ pyarrow not installed — cubes written as csv.gz")
+    print("🧊 Cubes: " + ", ".join(f"{n} ({len(c):,})" for n, c in cubes.items()))
+    return cubes
+
+def load_cube(name, out_dir="data/outputs") -> pd.DataFrame:
+    """
+    Load one cube indexed (and sorted) by its dimensions, so dashboard queries are lookups:
+
+        load_cube("country_pair").loc[("bus", "FR", "DE")]
+    """
+    dims = dict([BASE, CITY], **ROLLUPS)[name]
+    path = os.path.join(out_dir, CUBE_DIR, f"{name}.parquet")
+    if os.path.exists(path):
+        cube = pd.read_parquet(path)
+    else:
+        cube = pd.read_csv(os.path.join(out_dir, CUBE_DIR, f"{name}.csv.gz"), keep_default_na=False,
+                           na_values={m: [""] for m in MEASURES + ["mean_duration_min"]})
+    return cube.set_index(dims).sort_index()
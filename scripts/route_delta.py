@@ -0,0 +1,59 @@
+# scripts/route_delta.py
+import os
+import pandas as pd
+from connectors.string_pool import as_text
+from scripts.validate_routes import DEDUP_KEY
+
+KEY_COLS = DEDUP_KEY
+KEYS_FILE = "route_keys.csv.gz"
+
+def _hash(df: pd.DataFrame, cols) -> pd.Series:
+    # stable 64-bit hash per row (fixed hash_key, independent of index); str-normalized so
+    # None/NaN and dtype drift between runs don't register as changes
+    frame = pd.DataFrame({c: as_text(df[c]) if c in df.columns else "" for c in cols})
+    return pd.util.hash_pandas_object(frame, index=False).astype("uint64")
+
+def hash_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Key columns + key_hash (route identity) + row_hash (route content)."""
+    out = df.reindex(columns=KEY_COLS).copy()
+    out["key_hash"] = _hash(df, KEY_COLS).to_numpy()
+    out["row_hash"] = _hash(df, sorted(df.columns)).to_numpy()
+    return out
+
+def _load_keys(path):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype={"key_hash": "uint64", "row_hash": "uint64"})
+
+def write_delta(df: pd.DataFrame, out_dir="data/outputs"):
+    """
+    Hash-join this run against the previous run's key file and write
+    delta_added.csv / delta_changed.csv (full rows) and delta_removed.csv (key columns only),
+    then replace the key file with this run's keys.
+    """
+    keys_path = os.path.join(out_dir, KEYS_FILE)
+    cur = hash_rows(df)
+    cur["_row"] = range(len(cur))
+    cur = cur.drop_duplicates(subset="key_hash", keep="first")
+    prev = _load_keys(keys_path)
+
+    if prev is None:
+        print("   (no previous key file — every route counts as added)")
+        prev = cur.iloc[0:0].drop(columns="_row")
+
+    j = cur[["key_hash", "row_hash", "_row"]].merge(
+        prev[["key_hash", "row_hash"]], on="key_hash", how="outer",
+        suffixes=("", "_prev"), indicator=True
+    )
+    added = j.loc[j["_merge"] == "left_only", "_row"].astype(int)
+    changed = j.loc[(j["_merge"] == "both") & (j["row_hash"] != j["row_hash_prev"]), "_row"].astype(int)
+    removed = prev[prev["key_hash"].isin(j.loc[j["_merge"] == "right_only", "key_hash"])]
+
+    df.iloc[added.sort_values()].to_csv(os.path.join(out_dir, "delta_added.csv"), index=False)
+    df.iloc[changed.sort_values()].to_csv(os.path.join(out_dir, "delta_changed.csv"), index=False)
+    removed[KEY_COLS].to_csv(os.path.join(out_dir, "delta_removed.csv"), index=False)
+    # fixed gzip mtime: identical runs give identical bytes, so the workflow commits nothing
+    cur.drop(columns="_row").to_csv(keys_path, index=False, compression={"method": "gzip", "mtime": 0})
+
+    print(f"🔁 Delta vs previous run: +{len(added):,} added, ~{len(changed):,} changed, -{len(removed):,} removed")
+    return len(added), len(changed), len(removed)
@@ -0,0 +1,101 @@
+# scripts/shard_output.py
+import os, re, io, gzip, json, hashlib
+import pandas as pd
+from connectors.string_pool import sort_key
+
+SHARD_DIR = "shards"
+MANIFEST = "manifest.json"
+SORT_COLS = ["origin_city", "origin_station", "destination_city", "destination_station", "operator_name"]
+
+try:
+    import zstandard  # optional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+def _slug(x) -> str:
+    if pd.isna(x) or not str(x).strip():
+        return "unknown"
+    return re.sub(r"[^a-z0-9]+", "_", str(x).strip().lower()).strip("_") or "unknown"
+
+def _compress(data: bytes, method: str) -> bytes:
+    # both paths are byte-for-byte deterministic (gzip: fixed mtime, no filename)
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception:
+        return {"shards": {}}
+
+def write_shards(df: pd.DataFrame, out_dir="data/outputs", compression="gzip"):
+    """
+    Write one key-sorted, compressed CSV per (transport_type, origin_country) under
+    <out_dir>/shards/ plus manifest.json with row counts and sha256 per shard.
+    Shards whose content hash matches the previous manifest are left untouched on disk.
+    """
+    if compression == "zstd" and zstandard is None:
+        print("⚠️ zstandard not installed — falling back to gzip shards")
+        compression = "gzip"
+    ext = ".csv.zst" if compression == "zstd" else ".csv.gz"
+    root = os.path.join(out_dir, SHARD_DIR)
+    manifest_path = os.path.join(root, MANIFEST)
+    old = _load_manifest(manifest_path)["shards"]
+
+    df = df.copy()
+    df["_mode"] = df.get("transport_type", pd.Series(index=df.index, dtype=object)).map(lambda x: _slug(x) if pd.notna(x) else "bus")
+    df["_country"] = df.get("origin_country", pd.Series(index=df.index, dtype=object)).map(_slug)
+    sort_cols = [c for c in SORT_COLS if c in df.columns]
+    # full-row hash as final tie-breaker so input order never changes shard bytes
+    df["_tie"] = pd.util.hash_pandas_object(df.drop(columns=["_mode", "_country"]).astype(str), index=False)
+    # pooled (categorical) name columns sort by their text, not by code
+    df = df.sort_values(["_mode", "_country"] + sort_cols + ["_tie"], kind="mergesort", na_position="last",
+                        key=sort_key)
+    df = df.drop(columns="_tie")
+
+    shards, written = {}, 0
+    for (mode, country), part in df.groupby(["_mode", "_country"], observed=True, sort=True):
+        rel = f"{mode}/{country}{ext}"
+        raw = part.drop(columns=["_mode", "_country"]).to_csv(index=False).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()   # hash of the uncompressed CSV
+        path = os.path.join(root, rel)
+        shards[rel] = {"rows": int(len(part)), "sha256": digest}
+        if old.get(rel, {}).get("sha256") == digest and os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_compress(raw, compression))
+        written += 1
+
+    # drop shards that disappeared since the previous run
+    for rel in set(old) - set(shards):
+        path = os.path.join(root, rel)
+        if os.path.exists(path):
+            os.remove(path)
+
+    os.makedirs(root, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump({"compression": compression, "shards": dict(sorted(shards.items()))}, f, indent=1)
+    print(f"🗂️  Shards: {len(shards)} total, {written} rewritten, {len(set(old) - set(shards))} removed")
+    return shards
+
+def read_shards(out_dir="data/outputs", **read_csv_kwargs) -> pd.DataFrame:
+    """All shards listed in <out_dir>/shards/manifest.json as one frame, in manifest order."""
+    root = os.path.join(out_dir, SHARD_DIR)
+    frames = []
+    for rel in _load_manifest(os.path.join(root, MANIFEST))["shards"]:
+        path = os.path.join(root, rel)
+        if rel.endswith(".zst"):
+            if zstandard is None:
+                raise ImportError("reading .csv.zst shards needs zstandard")
+            with open(path, "rb") as f:
+                data = zstandard.ZstdDecompressor().decompress(f.read())
+            frames.append(pd.read_csv(io.BytesIO(data), **read_csv_kwargs))
+        else:
+            frames.append(pd.read_csv(path, compression="gzip", **read_csv_kwargs))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
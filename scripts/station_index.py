@@ -0,0 +1,173 @@
+# scripts/station_index.py
+import os, pickle
+import numpy as np
+import pandas as pd
+from scripts.geometry import EARTH_RADIUS_KM
+from connectors.string_pool import as_text
+from scripts import shard_output
+
+try:
+    from scipy.spatial import cKDTree  # optional: pip install scipy
+except ImportError:
+    cKDTree = None
+
+STATIONS_FILE = "stations.csv"
+INDEX_FILE = "station_index.pkl"
+# where StationIndex.load finds the routes: "shards" (shards/manifest.json) or "csv" (ROUTES_FILE)
+ROUTES_FILE = "world_bus.csv"
+ROUTE_DTYPES = {"origin_station_id": np.uint64, "destination_station_id": np.uint64, "departures_by_hour": str}
+
+def _station_ids(station, lat, lon) -> np.ndarray:
+    # stable across runs: name + coordinates rounded to ~10 m
+    key = pd.DataFrame({
+        "s": as_text(station),
+        "lat": pd.to_numeric(lat, errors="coerce").round(4).astype(str).to_numpy(),
+        "lon": pd.to_numeric(lon, errors="coerce").round(4).astype(str).to_numpy(),
+    })
+    return pd.util.hash_pandas_object(key, index=False).to_numpy(dtype=np.uint64)
+
+def assign_station_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """Add origin_station_id / destination_station_id (uint64) to the route table."""
+    df = df.copy()
+    df["origin_station_id"] = _station_ids(df["origin_station"], df["origin_lat"], df["origin_lon"])
+    df["destination_station_id"] = _station_ids(df["destination_station"], df["dest_lat"], df["dest_lon"])
+    return df
+
+def _unit_xyz(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def _chord(km):
+    # great-circle distance on the unit sphere -> straight-line (chord) distance the tree uses
+    return 2 * np.sin(np.asarray(km, dtype=np.float64) / (2 * EARTH_RADIUS_KM))
+
+def _arc_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+def build_stations(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per station seen as origin or destination, with coordinates and outgoing route count."""
+    ends = [
+        ("origin_station_id", "origin_station", "origin_city", "origin_country", "origin_lat", "origin_lon"),
+        ("destination_station_id", "destination_station", "destination_city", "destination_country", "dest_lat", "dest_lon"),
+    ]
+    cols = ["station_id", "station", "city", "country", "lat", "lon"]
+    st = pd.concat([df[list(e)].set_axis(cols, axis=1) for e in ends], ignore_index=True)
+    st = st.dropna(subset=["lat", "lon"]).drop_duplicates("station_id")
+    out = df["origin_station_id"].value_counts()
+    st["routes_out"] = st["station_id"].map(out).fillna(0).astype("int32")
+    return st.sort_values("station_id").reset_index(drop=True)
+
+def write_index(df: pd.DataFrame, out_dir="data/outputs", routes="csv"):
+    """
+    Write stations.csv and a pickled KD-tree over the stations' unit-sphere xyz.
+    `routes` names the route output this build wrote ("csv" or "shards"), which load() joins.
+    """
+    st = build_stations(df)
+    st.to_csv(os.path.join(out_dir, STATIONS_FILE), index=False)
+    if cKDTree is None:
+        print(f"⚠️ scipy not installed — wrote {len(st):,} stations, skipped the spatial index")
+        return st
+    tree = cKDTree(_unit_xyz(st["lat"], st["lon"]))
+    with open(os.path.join(out_dir, INDEX_FILE), "wb") as f:
+        pickle.dump({"tree": tree, "station_id": st["station_id"].to_numpy(dtype=np.uint64), "routes": routes}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"📍 Station index: {len(st):,} stations")
+    return st
+
+class StationIndex:
+    """
+    k-nearest and radius queries over the build's stations, joined to their outgoing routes.
+
+        idx = StationIndex.load("data/outputs")
+        idx.routes_within(48.137, 11.575, 20)   # all routes departing within 20 km of Munich
+    """
+
+    def __init__(self, tree, stations: pd.DataFrame, routes: pd.DataFrame = None):
+        self.tree = tree
+        self.stations = stations.reset_index(drop=True)
+        self.routes = None
+        if routes is not None:
+            # CSR layout: routes sorted by origin station, offsets per station row
+            order = np.argsort(routes["origin_station_id"].to_numpy(dtype=np.uint64), kind="stable")
+            self.routes = routes.iloc[order].reset_index(drop=True)
+            sid = self.routes["origin_station_id"].to_numpy(dtype=np.uint64)
+            ids = self.stations["station_id"].to_numpy(dtype=np.uint64)
+            self._lo = np.searchsorted(sid, ids, side="left")
+            self._hi = np.searchsorted(sid, ids, side="right")
+
+    @classmethod
+    def load(cls, out_dir="data/outputs", with_routes=True, routes=None):
+        """
+        Load the index and, with_routes, the route output of the same build: the source
+        recorded by write_index, unless `routes` ("csv" / "shards") overrides it.
+        """
+        st = pd.read_csv(os.path.join(out_dir, STATIONS_FILE), dtype={"station_id": np.uint64})
+        path = os.path.join(out_dir, INDEX_FILE)
+        saved = {}
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+            st = st.set_index("station_id").loc[saved["station_id"]].reset_index()
+            tree = saved["tree"]
+        elif cKDTree is not None:
+            tree = cKDTree(_unit_xyz(st["lat"], st["lon"]))
+        else:
+            raise ImportError("StationIndex needs scipy (or a prebuilt station_index.pkl)")
+        table = None
+        if with_routes:
+            routes = routes or saved.get("routes") or (
+                "shards" if os.path.exists(os.path.join(out_dir, shard_output.SHARD_DIR, shard_output.MANIFEST)) else "csv")
+            if routes == "shards":
+                table = shard_output.read_shards(out_dir, dtype=ROUTE_DTYPES)
+            else:
+                table = pd.read_csv(os.path.join(out_dir, ROUTES_FILE), dtype=ROUTE_DTYPES)
+        return cls(tree, st, table)
+
+    def nearest(self, lat, lon, k=1) -> pd.DataFrame:
+        """k nearest stations to one point, with distance_km."""
+        d, i = self.tree.query(_unit_xyz([lat], [lon])[0], k=k)
+        d, i = np.atleast_1d(d), np.atleast_1d(i)
+        keep = i < len(self.stations)
+        return self.stations.iloc[i[keep]].assign(distance_km=_arc_km(d[keep]))
+
+    def within_rows(self, lat, lon, radius_km):
+        """Fast path: (station row positions, distance_km) within radius_km, nearest first."""
+        xyz = _unit_xyz([lat], [lon])[0]
+        i = np.asarray(self.tree.query_ball_point(xyz, _chord(radius_km)), dtype=np.intp)
+        d = np.linalg.norm(self.tree.data[i] - xyz, axis=1) if len(i) else np.empty(0)
+        order = np.argsort(d, kind="stable")
+        return i[order], _arc_km(d[order])
+
+    def within(self, lat, lon, radius_km) -> pd.DataFrame:
+        """Stations within radius_km of one point (great-circle), nearest first."""
+        i, d = self.within_rows(lat, lon, radius_km)
+        return self.stations.iloc[i].assign(distance_km=d)
+
+    def within_many(self, lats, lons, radius_km) -> list:
+        """Vectorized radius query: list of station row positions per query point."""
+        return self.tree.query_ball_point(_unit_xyz(lats, lons), _chord(radius_km))
+
+    def _routes_for(self, rows) -> pd.DataFrame:
+        if self.routes is None:
+            raise ValueError("index was loaded without routes")
+        rows = np.asarray(rows, dtype=np.intp)
+        lo, hi = self._lo[rows], self._hi[rows]
+        n = hi - lo
+        idx = np.repeat(lo, n) + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n))
+        return self.routes.iloc[idx]
+
+    def routes_within(self, lat, lon, radius_km) -> pd.DataFrame:
+        """
+        Outgoing routes of every station within radius_km, with station_distance_km (query
+        point -> station); the route's own distance_km is left as is.
+        """
+        rows, d = self.within_rows(lat, lon, radius_km)
+        dist = np.repeat(d, self._hi[rows] - self._lo[rows]) if self.routes is not None else None
+        return self._routes_for(rows).assign(station_distance_km=dist)
+
+    def routes_nearest(self, lat, lon, k=1) -> pd.DataFrame:
+        """Outgoing routes of the k nearest stations, with station_distance_km as in routes_within."""
+        st = self.nearest(lat, lon, k)
+        rows = st.index.to_numpy()
+        dist = np.repeat(st["distance_km"].to_numpy(), self._hi[rows] - self._lo[rows])
+        return self._routes_for(rows).assign(station_distance_km=dist)
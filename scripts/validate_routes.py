@@ -0,0 +1,144 @@
+# scripts/validate_routes.py
+import os
+import numpy as np
+import pandas as pd
+from connectors.bus_flixbus import COUNTRY_BOUNDS
+from scripts.geometry import COORD_COLS, haversine_km, duration_minutes
+
+# Values that mean "missing" once a column has been through astype(str)
+NULL_TOKENS = ["", "nan", "none", "null", "<na>"]
+
+REQUIRED = ["origin_city", "origin_station", "destination_city", "destination_station", "operator_name"]
+# Modes whose sources carry no operator (AeroDataBox airport routes list destinations, not airlines)
+OPERATOR_OPTIONAL_MODES = {"air"}
+
+# Plausible average door-to-door speed (km/h) per mode; only checked when coordinates are present
+SPEED_LIMITS = {
+    "bus":  (3, 120),
+    "rail": (5, 350),
+    "sea":  (3, 80),
+    "air":  (80, 1100),
+}
+
+DEDUP_KEY = ["transport_type", "operator_name", "origin_station", "destination_station"]
+
+def _per_value(s: pd.Series, fn) -> np.ndarray:
+    # string tests on a pooled/categorical column run once per category, then take by code
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        hit = np.append(fn(pd.Series(s.cat.categories.astype(str))).to_numpy(dtype=bool), False)
+        return hit[s.cat.codes.to_numpy()]   # code -1 (missing) -> the appended False
+    return fn(s.astype(str)).to_numpy(dtype=bool)
+
+def _blank(s: pd.Series) -> pd.Series:
+    return s.isna() | _per_value(s, lambda v: v.str.strip().str.lower().isin(NULL_TOKENS))
+
+def _col(df, name):
+    return df[name] if name in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+
+def _rule_masks(df: pd.DataFrame) -> dict:
+    """One boolean mask per rule, all computed column-wise over the whole frame."""
+    masks = {}
+    mode = _col(df, "transport_type").astype(object).fillna("bus").astype(str).str.lower()
+
+    # required fields ("nan"/"None" strings count as missing)
+    missing = np.zeros(len(df), dtype=bool)
+    for c in REQUIRED:
+        blank = _blank(_col(df, c)).to_numpy()
+        if c == "operator_name":
+            blank = blank & ~mode.isin(OPERATOR_OPTIONAL_MODES).to_numpy()
+        missing |= blank
+    masks["missing_required"] = missing
+
+    # mis-delimited rows (e.g. a tab-separated vendor file read with sep=",")
+    embedded = np.zeros(len(df), dtype=bool)
+    for c in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            embedded |= _per_value(df[c], lambda v: v.str.contains("\t", regex=False))
+    masks["embedded_delimiter"] = embedded
+
+    # duration: scheduled modes must have a positive HH:MM (clip(lower=0) produced "00:00")
+    minutes = duration_minutes(_col(df, "duration"))
+    masks["bad_duration"] = ((mode != "air") & ~(minutes > 0)).to_numpy()
+
+    # implausible speed: distance / duration outside the mode's envelope
+    if set(COORD_COLS).issubset(df.columns):
+        km = df["distance_km"].to_numpy(dtype=float) if "distance_km" in df.columns else \
+            haversine_km(df["origin_lat"], df["origin_lon"], df["dest_lat"], df["dest_lon"])
+        lo = mode.map(lambda m: SPEED_LIMITS.get(m, (0, np.inf))[0]).to_numpy(dtype=float)
+        hi = mode.map(lambda m: SPEED_LIMITS.get(m, (0, np.inf))[1]).to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kmh = km / (minutes.to_numpy(dtype=float) / 60.0)
+            masks["implausible_speed"] = np.isfinite(kmh) & ((kmh < lo) | (kmh > hi))
+
+    # cross-border consistency: a city must map to one country across the whole dataset
+    cities = pd.concat([
+        pd.DataFrame({"city": _col(df, "origin_city"), "country": _col(df, "origin_country")}),
+        pd.DataFrame({"city": _col(df, "destination_city"), "country": _col(df, "destination_country")}),
+    ], ignore_index=True).dropna()
+    n_countries = cities.drop_duplicates().groupby("city")["country"].size()
+    conflicted = n_countries.index[n_countries > 1]
+    masks["country_conflict"] = (
+        _col(df, "origin_city").isin(conflicted) | _col(df, "destination_city").isin(conflicted)
+    ).to_numpy()
+    # overlapping bounding boxes: the inferred country is a first-match guess
+    if set(COORD_COLS).issubset(df.columns):
+        amb = np.zeros(len(df), dtype=bool)
+        for la, lo in (("origin_lat", "origin_lon"), ("dest_lat", "dest_lon")):
+            lat = pd.to_numeric(df[la], errors="coerce").to_numpy(dtype=float)
+            lon = pd.to_numeric(df[lo], errors="coerce").to_numpy(dtype=float)
+            hits = np.zeros(len(df), dtype=np.int8)
+            for (minlat, minlon), (maxlat, maxlon) in COUNTRY_BOUNDS.values():
+                hits += (lat >= minlat) & (lat <= maxlat) & (lon >= minlon) & (lon <= maxlon)
+            amb |= hits > 1
+        masks["ambiguous_country"] = amb
+    masks["missing_country"] = (
+        _blank(_col(df, "origin_country")) | _blank(_col(df, "destination_country"))
+    ).to_numpy()
+
+    # duplicates on the route key (first occurrence wins)
+    key = [c for c in DEDUP_KEY if c in df.columns]
+    masks["duplicate"] = df.duplicated(subset=key, keep="first").to_numpy() if key else np.zeros(len(df), dtype=bool)
+    return masks
+
+# Rules that send a row to quarantine; the rest are only reported
+BLOCKING = {"missing_required", "embedded_delimiter", "bad_duration", "implausible_speed", "duplicate"}
+
+def validate(df: pd.DataFrame, out_dir="data/outputs"):
+    """
+    Run all rules over `df`, write validation_report.csv (rule x operator counts) and
+    quarantine.csv (blocked rows + the rules they broke) to `out_dir`, and return the clean rows.
+    """
+    if df.empty:
+        return df
+    df = df.reset_index(drop=True)
+    masks = _rule_masks(df)
+    names = list(masks)
+
+    # pack rule hits into one bitmask column -> cheap to count and to render for quarantined rows only
+    bits = np.zeros(len(df), dtype=np.int64)
+    for i, n in enumerate(names):
+        bits |= masks[n].astype(np.int64) << i
+    block_bits = sum(1 << i for i, n in enumerate(names) if n in BLOCKING)
+    blocked = (bits & block_bits) != 0
+
+    operator = _col(df, "operator_name").astype(object).fillna("?").astype(str)
+    report = pd.concat([
+        pd.DataFrame({"rule": n, "operator_name": operator[masks[n]]}) for n in names
+    ], ignore_index=True).value_counts().rename("violations").reset_index()
+    report["blocking"] = report["rule"].isin(BLOCKING)
+    report = report.sort_values(["rule", "violations"], ascending=[True, False])
+
+    quarantine = df[blocked].copy()
+    qbits = bits[blocked]
+    quarantine["violations"] = [
+        "|".join(n for i, n in enumerate(names) if b >> i & 1) for b in qbits
+    ]
+
+    os.makedirs(out_dir, exist_ok=True)
+    report.to_csv(os.path.join(out_dir, "validation_report.csv"), index=False)
+    quarantine.to_csv(os.path.join(out_dir, "quarantine.csv"), index=False)
+
+    for n in names:
+        print(f"   {n:<20} {int(masks[n].sum()):>7,}{'  (quarantined)' if n in BLOCKING else ''}")
+    print(f"🧹 Validation: kept {int((~blocked).sum()):,} rows, quarantined {int(blocked.sum()):,}")
+    return df[~blocked].reset_index(drop=True)
@@ -0,0 +1,35 @@
+# tests/test_connector_runner.py
+import pandas as pd
+from scripts import connector_runner, shard_output
+
+def _published(tmp_path):
+    df = pd.DataFrame({
+        "transport_type": ["bus", "bus", "air"],
+        "operator_name": ["FlixBus/EU", "Megabus UK", "Lufthansa"],
+        "origin_country": ["DE", "GB", "DE"],
+        "origin_city": ["Berlin", "Glasgow", "Munich"],
+        "destination_city": ["Hamburg", "Inverness", "Paris"],
+        "departures_by_hour": ["000000001000000000000000"] * 3,
+        "distance_km": [255.0, 175.0, 685.0],
+    })
+    shard_output.write_shards(df, str(tmp_path))
+    return connector_runner.LastPublished(str(tmp_path))
+
+def _fail():
+    raise RuntimeError("feed down")
+
+def test_failed_connector_reuses_its_published_rows(tmp_path):
+    published = _published(tmp_path)
+    df, status = connector_runner.run("flixbus", "FlixBus", _fail,
+                                      last_good=lambda: published.rows({"operator_name": ["FlixBus/EU"]}))
+    assert status["status"] == "stale" and status["rows"] == 1
+    assert df["origin_city"].astype(str).tolist() == ["Berlin"]
+    assert df["departures_by_hour"].astype(str).tolist() == ["000000001000000000000000"]
+    assert "distance_km" not in df.columns          # recomputed by the build like fresh rows
+
+def test_missing_without_published_rows(tmp_path):
+    published = _published(tmp_path)
+    _, status = connector_runner.run("x", "X", _fail,
+                                     last_good=lambda: published.rows({"operator_name": ["Nobody"]}))
+    assert status["status"] == "missing"
+    assert connector_runner.LastPublished(str(tmp_path / "empty")).rows({"transport_type": ["air"]}) is None
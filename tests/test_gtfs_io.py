@@ -0,0 +1,44 @@
+# tests/test_gtfs_io.py
+import io, zipfile
+import pytest
+from connectors import gtfs_io
+
+def _zip(**files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, text in files.items():
+            z.writestr(name.replace("_txt", ".txt"), text)
+    return zipfile.ZipFile(buf)
+
+@pytest.fixture(params=["pyarrow", "c"])
+def engine(request, monkeypatch):
+    if request.param == "c":
+        monkeypatch.setattr(gtfs_io, "pacsv", None)
+    elif gtfs_io.pacsv is None:
+        pytest.skip("pyarrow not installed")
+    return request.param
+
+def test_ids_round_trip_as_text(engine):
+    zf = _zip(trips_txt=(
+        "route_id,service_id,trip_id\n"
+        "1.10,0123,12345678901234567890123\n"
+        "1.1,0123,12345678901234567890124\n"
+    ))
+    df = gtfs_io.read_table(zf, "trips.txt", categorical=False)
+    assert df["route_id"].tolist() == ["1.10", "1.1"]
+    assert df["service_id"].tolist() == ["0123", "0123"]
+    assert df["trip_id"].tolist() == ["12345678901234567890123", "12345678901234567890124"]
+    assert gtfs_io.read_table(zf, "trips.txt")["trip_id"].nunique() == 2
+
+def test_numbers_times_and_missing(engine):
+    zf = _zip(stop_times_txt=(
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence,shape_dist_traveled\n"
+        "007,08:00:00,25:10:00,0042,1,0.5\n"
+        "007,,,0043,2,1.0\n"
+    ))
+    df = gtfs_io.read_table(zf, "stop_times.txt", categorical=False)
+    assert list(df.columns) == ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]
+    assert df["stop_id"].tolist() == ["0042", "0043"]
+    assert df["departure_time"].tolist()[0] == 25 * 3600 + 600
+    assert df["arrival_time"].isna().tolist() == [False, True]
+    assert df["stop_sequence"].tolist() == [1, 2]
@@ -0,0 +1,27 @@
+# tests/test_gtfs_profiles.py
+import io, zipfile
+import numpy as np
+import pytest
+from connectors import gtfs_checkpoint, gtfs_profiles, bus_flixbus
+
+def test_no_valid_departures_gives_empty_profiles():
+    out = gtfs_profiles.departure_profiles(np.array([0, 1, -1]), np.array([np.nan, -5, 3600]), 2)
+    assert list(out.columns) == gtfs_profiles.PROFILE_COLUMNS and len(out) == 2
+    assert out["first_departure"].isna().all() and out["headway_p50_min"].isna().all()
+    assert len(gtfs_profiles.departure_profiles([], [], 0)) == 0
+
+@pytest.mark.filterwarnings("error")   # NaN group codes used to be cast to int64
+def test_profiles_skip_rows_without_a_city(monkeypatch):
+    monkeypatch.setattr(gtfs_checkpoint, "ENABLED", False)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("routes.txt", "route_id,route_type\nR,3\n")
+        z.writestr("trips.txt", "route_id,trip_id,service_id\nR,T1,S\nR,T2,S\nR,T3,S\n")
+        z.writestr("stops.txt", "stop_id,stop_name,stop_lat,stop_lon\nB,Berlin,52.5,13.4\nH,Hamburg,53.55,10.0\n")
+        z.writestr("stop_times.txt", "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+                   "T1,08:00:00,08:00:00,B,1\nT1,11:00:00,11:00:00,H,2\n"
+                   "T2,10:00:00,10:00:00,B,1\nT2,13:00:00,13:00:00,H,2\n"
+                   "T3,09:00:00,09:00:00,B,1\nT3,12:00:00,12:00:00,X,2\n")   # X is not in stops.txt
+    df = bus_flixbus._parse_gtfs_zip(buf.getvalue(), feed_label="test", all_pairs=False)
+    row = df[df["destination_city"] == "Hamburg"].iloc[0]
+    assert (row["first_departure"], row["last_departure"], row["headway_p50_min"]) == ("08:00", "10:00", 120)
@@ -0,0 +1,141 @@
+# tests/test_http_download.py
+# Resumable downloads against a local server that drops every connection part-way.
+import os, gzip, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from connectors import http_download
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+class _DroppingHandler(BaseHTTPRequestHandler):
+    drop_after = None      # bytes sent per response before the connection is cut (None = never)
+    ranges = True
+    etag = '"v1"'
+    bodies = 0             # GET responses served
+    compress = False       # gzip the whole body whenever the client accepts it
+
+    def log_message(self, *args):
+        pass
+
+    def _span(self):
+        rng = self.headers.get("Range")
+        if not (rng and self.ranges):
+            return 0, len(PAYLOAD) - 1, False
+        start, _, end = rng.split("=", 1)[1].partition("-")
+        return int(start), int(end) if end else len(PAYLOAD) - 1, True
+
+    def do_HEAD(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.send_header("Accept-Ranges", "bytes" if self.ranges else "none")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+
+    def do_GET(self):
+        type(self).bodies += 1
+        if self.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(PAYLOAD)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        start, end, partial = self._span()
+        if start >= len(PAYLOAD):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+            self.end_headers()
+            return
+        body = PAYLOAD[start:end + 1]
+        self.send_response(206 if partial else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        if partial:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        self.end_headers()
+        if self.drop_after is not None:
+            body = body[:self.drop_after]
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.close_connection = True
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_download, "BACKOFF_BASE", 0.0)
+    handler = type("Handler", (_DroppingHandler,), {})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{httpd.server_port}/feed.zip"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_resumes_after_drops(server, tmp_path):
+    handler, url = server
+    handler.drop_after = 400 * 1000   # well below the old 1 MiB read block
+    path = http_download.download(url, dest=str(tmp_path / "feed.zip"), tries=3, parallel=1)
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(path + ".part.meta")
+
+def test_parallel_segments_resume(server, tmp_path, monkeypatch):
+    handler, url = server
+    handler.drop_after = 300 * 1000
+    monkeypatch.setattr(http_download, "MIN_SEGMENT_BYTES", 1024 * 1024)
+    path = http_download.download(url, dest=str(tmp_path / "feed.zip"), tries=3, parallel=3)
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+
+def test_resumes_partial_left_by_previous_run(server, tmp_path):
+    handler, url = server
+    dest = str(tmp_path / "feed.zip")
+    with open(dest + ".part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+    path = http_download.download(url, dest=dest, tries=2, parallel=1)
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+
+def test_gives_up_without_progress(server, tmp_path):
+    handler, url = server
+    handler.drop_after = 0
+    with pytest.raises(RuntimeError, match="Download failed"):
+        http_download.download(url, dest=str(tmp_path / "feed.zip"), tries=2, parallel=1)
+    # what arrived (nothing here) stays on disk for the next run to resume
+    assert os.path.exists(str(tmp_path / "feed.zip.part"))
+
+def test_size_mismatch_rejected(server, tmp_path):
+    _, url = server
+    with pytest.raises(RuntimeError, match="expected"):
+        http_download.download(url, dest=str(tmp_path / "feed.zip"), expected_size=1, parallel=1)
+
+def test_small_drops_still_progress(server, tmp_path):
+    handler, url = server
+    handler.drop_after = 20 * 1000    # less than one network read
+    path = http_download.download(url, dest=str(tmp_path / "feed.zip"), tries=2, parallel=1)
+    with open(path, "rb") as f:
+        assert f.read() == PAYLOAD
+
+def test_kept_download_revalidates(server, tmp_path, monkeypatch):
+    handler, url = server
+    monkeypatch.setattr(http_download, "DOWNLOAD_DIR", str(tmp_path))
+    assert http_download.download_bytes(url, keep=True, parallel=1) == PAYLOAD
+    assert http_download.download_bytes(url, keep=True, parallel=1) == PAYLOAD
+    assert handler.bodies == 1            # second call was a 304
+    handler.etag = '"v2"'                 # feed changed upstream -> fetched again
+    assert http_download.download_bytes(url, keep=True, parallel=1) == PAYLOAD
+    assert handler.bodies == 2
+
+def test_download_bytes_removes_file_by_default(server, tmp_path, monkeypatch):
+    _, url = server
+    monkeypatch.setattr(http_download, "DOWNLOAD_DIR", str(tmp_path))
+    assert http_download.download_bytes(url, parallel=1) == PAYLOAD
+    assert os.listdir(tmp_path) == []
+
+def test_asks_for_uncompressed_bytes(server, tmp_path):
+    handler, url = server
+    handler.compress = True              # would gzip the body if we let it
+    assert http_download.download_bytes(url, dest=str(tmp_path / "feed.zip"), parallel=1) == PAYLOAD
@@ -0,0 +1,41 @@
+# tests/test_reconcile_cities.py
+import pandas as pd
+from scripts import reconcile_cities
+
+def _routes(rows):
+    # rows: (origin_city, origin_country, lat, lon); every route ends in one fixed city
+    return pd.DataFrame({
+        "origin_city": [r[0] for r in rows], "origin_country": [r[1] for r in rows],
+        "origin_lat": [r[2] for r in rows], "origin_lon": [r[3] for r in rows],
+        "destination_city": "Nowhere", "destination_country": "US",
+        "dest_lat": 0.0, "dest_lon": 0.0,
+    })
+
+def test_same_name_far_apart_stays_apart(tmp_path):
+    df = _routes([
+        ("Richmond", "US", 37.54, -77.43),           # Virginia
+        ("Richmond", "US", 37.54, -77.43),
+        ("Richmond (CA)", "US", 37.94, -122.35),     # California, normalizes to "richmond" too
+    ])
+    out = reconcile_cities.reconcile(df, mapping_path=str(tmp_path / "map.csv"))
+    assert out["origin_city"].astype(str).tolist() == ["Richmond", "Richmond", "Richmond (CA)"]
+
+def test_nearby_spellings_still_merge(tmp_path):
+    df = _routes([
+        ("Frankfurt", "DE", 50.107, 8.663),
+        ("Frankfurt", "DE", 50.107, 8.663),
+        ("Frankfurt Hbf", "DE", 50.107, 8.663),
+        ("Frankfurt (Flughafen)", "DE", 50.05, 8.57),
+    ])
+    out = reconcile_cities.reconcile(df, mapping_path=str(tmp_path / "map.csv"))
+    assert set(out["origin_city"].astype(str)) == {"Frankfurt"}
+
+def test_fuzzy_match_needs_nearby_stations(tmp_path):
+    df = _routes([
+        ("Sevilla", "ES", 37.39, -5.98),
+        ("Seville", "ES", 37.38, -5.99),
+        ("Sevillo", "ES", 43.0, -2.0),                # a similar name ~700 km away
+    ])
+    out = reconcile_cities.reconcile(df, mapping_path=str(tmp_path / "map.csv"))
+    city = out["origin_city"].astype(str).tolist()
+    assert city[0] == city[1] and city[2] == "Sevillo"